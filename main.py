@@ -1,12 +1,23 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 import os
 import sys
+from queue import Empty, Queue
 
 import customtkinter as ctk
 from customtkinter import filedialog as fd
 
-from src.functions import APP_VERSION, ICONS, LANGUAGE_VALUES, FONTS, DROPDOWN, OPTION, BUTTONS, help_page, \
-    reset_config, load_config, save_config, start_transcriber, start_writer, change_theme, start_subtitle
-from src.widgets import CTkScrollableDropdownFrame, CTkMessagebox, CTkLoader, SettingsInterface
+from src.functions import APP_VERSION, LANGUAGE_VALUES, FONTS, DROPDOWN, OPTION, BUTTONS, help_page, \
+    reset_config, load_config, save_config, start_preload, start_transcriber, start_writer, start_subtitle, \
+    subtitles_writer
+from src.jobs import CANCELLED, JobCancelled
+from src.progress import format_duration, format_progress
+from src.tracing import TRACE_DIR, Trace, dump_chrome_trace
+from src.widgets import CTkScrollableDropdownFrame, CTkMessagebox, CTkLoader, SettingsInterface, ICONS, change_theme
+
+IMPORTED_AT = time.perf_counter()
 
 CURRENT_PATH = os.path.dirname(os.path.realpath(__file__))
 CONFIG_FILE = f"{CURRENT_PATH}\\src\\config.json"
@@ -14,15 +25,36 @@ CONFIG_FILE = f"{CURRENT_PATH}\\src\\config.json"
 
 class WhisperGui(ctk.CTk):
     def __init__(self):
-        super().__init__()
-        self._on_startup()
-        self._init_window()
-        self._init_widgets()
+        self.startup_trace = Trace("startup", started=STARTED_AT)
+        self.startup_trace.add("imports", STARTED_AT, IMPORTED_AT)
+
+        with self.startup_trace.span("tk_init"):
+            super().__init__()
+        with self.startup_trace.span("config"):
+            self._on_startup()
+        with self.startup_trace.span("window"):
+            self._init_window()
+        with self.startup_trace.span("widgets"):
+            self._init_widgets()
 
         self.result = None
         self.file_path = None
+        self.loader = None
+        self.job = None
+        self.transcribing = False
+        self.stream_queue = Queue()
+        self.ui_queue = Queue()
+        self.progress_text = ""
+        self.progress_at = None
+        self.preload_job = None
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.first_frame_at = time.perf_counter()
+        self.after_idle(self.report_startup)
+        self.after(100, self.poll_ui)
+        if self.config.get("preload", True):
+            # Start once the window is on screen so loading never delays it.
+            self.after(200, self.preload_model)
 
     def _on_startup(self):
         if not os.path.exists(CONFIG_FILE):
@@ -34,14 +66,15 @@ class WhisperGui(ctk.CTk):
         self.language = self.config["language"]
         self.task = self.config["task"]
         self.device = self.config["device"]
+        self.vad = self.config.get("vad", False)
         self.models_value = self.config["models"]
         device_value = self.config["cuda"]
         self.theme_value = self.config["theme"]
 
         if device_value:
-            self.device_value = ["GPU", "CPU"]
+            self.device_value = ["GPU", "CPU", "CPU (int8)"]
         else:
-            self.device_value = ["CPU"]
+            self.device_value = ["CPU", "CPU (int8)"]
 
             self.after(5000, lambda: CTkMessagebox(
                 master=self,
@@ -80,7 +113,7 @@ class WhisperGui(ctk.CTk):
 
         self.left_frame = ctk.CTkFrame(self)
         self.left_frame.grid(row=1, column=0, sticky="ns", padx=2, pady=2)
-        self.left_frame.grid_rowconfigure(5, weight=1)
+        self.left_frame.grid_rowconfigure(6, weight=1)
 
         self.right_frame = ctk.CTkFrame(self)
         self.right_frame.grid(row=1, column=1, sticky="nsew", padx=2, pady=2)
@@ -130,12 +163,19 @@ class WhisperGui(ctk.CTk):
         self.device_option = ctk.CTkOptionMenu(self.left_frame, **OPTION)
         self.device_option.grid(row=4, column=1, padx=20, pady=10, sticky="e")
         self.device_dropdown = CTkScrollableDropdownFrame(self.device_option, values=self.device_value, **DROPDOWN,
-                                                          height=65)
+                                                          height=95)
         self.device_option.set(self.device)
 
+        vad_label = ctk.CTkLabel(self.left_frame, text="Skip Non-Speech", anchor="w", font=FONTS["small"])
+        vad_label.grid(row=5, column=0, padx=20, pady=10, sticky="w")
+        self.vad_switch = ctk.CTkSwitch(self.left_frame, text="", width=40)
+        self.vad_switch.grid(row=5, column=1, padx=20, pady=10, sticky="e")
+        if self.vad:
+            self.vad_switch.select()
+
         self.upload_btn = ctk.CTkButton(self.left_frame, text="Choose File", command=self._select_file_callback,
                                         **BUTTONS)
-        self.upload_btn.grid(row=5, column=0, padx=20, pady=20, sticky="sew", columnspan=2)
+        self.upload_btn.grid(row=6, column=0, padx=20, pady=20, sticky="sew", columnspan=2)
 
     def _right_widgets(self) -> None:
         self.textbox = ctk.CTkTextbox(self.right_frame, wrap="word", corner_radius=5, border_width=1, border_spacing=8,
@@ -159,14 +199,72 @@ class WhisperGui(ctk.CTk):
         version_label = ctk.CTkLabel(self.bottom_frame, text=APP_VERSION, font=FONTS["small"])
         version_label.grid(row=0, column=0, padx=20, pady=10, sticky="w")
 
+        self.status_label = ctk.CTkLabel(self.bottom_frame, text="", font=FONTS["small"])
+        self.status_label.grid(row=0, column=1, padx=20, pady=10, sticky="e")
+
+        self.progress_bar = ctk.CTkProgressBar(self.bottom_frame, width=160, height=8)
+        self.progress_bar.grid(row=0, column=2, padx=(0, 20), pady=10, sticky="e")
+        self.progress_bar.set(0)
+        self.progress_bar.grid_remove()
+
         help_btn = ctk.CTkButton(self.bottom_frame, text="Get help", command=help_page, width=100, height=28,
                                  corner_radius=3, fg_color="transparent", border_width=1, hover=False,
                                  text_color=("black", "white"))
-        help_btn.grid(row=0, column=1, padx=20, pady=10, sticky="e")
+        help_btn.grid(row=0, column=3, padx=20, pady=10, sticky="e")
+
+    def report_startup(self) -> None:
+        # after_idle runs once the first frame has been drawn.
+        self.update_idletasks()
+        self.startup_trace.add("first_frame", self.first_frame_at, time.perf_counter())
+        self.startup_trace.finish()
+        print(self.startup_trace.summary())
+        if TRACE_DIR:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            dump_chrome_trace([self.startup_trace], os.path.join(TRACE_DIR, "startup.json"))
+
+        # Quit right away so the cold-start time can be scripted.
+        if "--startup-time" in sys.argv:
+            self.destroy()
+
+    def preload_model(self) -> None:
+        options = {"model": self.model.lower(), "language": self.language.lower(), "device": self.device.lower(),
+                   "preload_english": self.config.get("preload_english", False)}
+        self.preload_job = start_preload(options)
+        if not self.transcribing:
+            self.status_label.configure(text=f"Loading {self.model} model...")
+        self.after(250, self.poll_preload)
+
+    def poll_preload(self) -> None:
+        if not self.preload_job.done():
+            self.after(250, self.poll_preload)
+            return
+
+        job, self.preload_job = self.preload_job, None
+        if self.transcribing or job.state == CANCELLED:
+            return
+
+        if job.error is not None:
+            self.status_label.configure(text="Model preload failed")
+        else:
+            self.status_label.configure(text=f"Model ready: {job.result['model']} ({job.result['device'].upper()}, "
+                                             f"{job.result['seconds']:.1f}s)")
 
     def show_settings(self) -> None:
         SettingsInterface(self).grid(row=0, column=0, sticky="nsew", rowspan=3, columnspan=3, padx=250, pady=20)
 
+    def on_ui(self, func: any) -> any:
+        # Job callbacks run on the scheduler thread, Tk widgets are only created and changed in poll_ui.
+        return lambda value: self.ui_queue.put((func, value))
+
+    def poll_ui(self) -> None:
+        while True:
+            try:
+                func, value = self.ui_queue.get_nowait()
+            except Empty:
+                break
+            func(value)
+        self.after(100, self.poll_ui)
+
     def subtitle_notification(self, msg: str) -> None:
         self.enable_controller()
         self.loader.stop_loader()
@@ -175,9 +273,82 @@ class WhisperGui(ctk.CTk):
 
     def show_results(self, result: dict) -> None:
         self.enable_controller()
+        self.textbox.delete("0.0", "end")
         self.textbox.insert("0.0", result["text"].strip())
         self.result = result
-        self.loader.stop_loader()
+        self.transcribing = False
+        self.status_label.configure(text="")
+        self.progress_bar.grid_remove()
+        self.start_btn.configure(text="Start", command=self.start_callback)
+
+    def show_segments(self, segments: list) -> None:
+        text = "".join(segment["text"] for segment in segments)
+        if not self.result["text"]:
+            text = text.lstrip()
+
+        self.textbox.insert("end", text)
+        self.result["text"] += text
+        self.result["segments"].extend(segments)
+        self.save_btn.configure(state="normal")
+
+    def poll_stream(self) -> None:
+        # Segments arrive from the worker thread, the textbox is only touched here on the Tk thread.
+        segments = []
+        while True:
+            try:
+                kind, payload = self.stream_queue.get_nowait()
+            except Empty:
+                break
+
+            if kind == "segments":
+                segments.extend(payload)
+                continue
+            if kind == "progress":
+                self.show_progress(payload)
+                continue
+
+            if segments:
+                self.show_segments(segments)
+            if kind == "done":
+                self.show_results(payload)
+            else:
+                self.show_error(payload)
+            return
+
+        if segments:
+            self.show_segments(segments)
+
+        if self.progress_at and time.monotonic() - self.progress_at > 60:
+            stalled = format_duration(time.monotonic() - self.progress_at)
+            self.status_label.configure(text=f"{self.progress_text} - no progress for {stalled}")
+        self.after(250, self.poll_stream)
+
+    def show_progress(self, progress: dict) -> None:
+        self.progress_text = format_progress(progress)
+        self.progress_at = time.monotonic()
+        self.status_label.configure(text=self.progress_text)
+        self.progress_bar.set(progress["percent"] / 100)
+
+    def show_error(self, error: Exception) -> None:
+        self.enable_controller()
+        if self.loader:
+            self.loader.stop_loader()
+            self.loader = None
+        self.transcribing = False
+        self.progress_bar.grid_remove()
+        self.start_btn.configure(text="Start", command=self.start_callback)
+
+        if isinstance(error, JobCancelled):
+            self.status_label.configure(text="Cancelled")
+            return
+
+        self.status_label.configure(text="")
+        CTkMessagebox(self, title="ERROR", message=str(error), corner_radius=8, icon="cancel")
+
+    def cancel_callback(self) -> None:
+        if self.job:
+            self.job.cancel()
+            self.status_label.configure(text="Cancelling...")
 
     def save_notification(self, msg: str) -> None:
         self.enable_controller()
@@ -205,12 +376,20 @@ class WhisperGui(ctk.CTk):
         )
 
         if file_path:
-            self.disable_controller()
-            self.loader = CTkLoader(self)
             options = {"output_dir": file_path, "result": self.result,
                        "audio_file": self.file_path}
 
-            start_writer(options, self.save_notification)
+            # Exporting partial output must not queue behind the running transcription.
+            if self.transcribing:
+                partial = dict(self.result, segments=list(self.result["segments"]))
+                subtitles_writer(dict(options, result=partial),
+                                 lambda msg: CTkMessagebox(self, title="SUCCESS", message=msg, corner_radius=8,
+                                                           icon="check"))
+                return
+
+            self.disable_controller()
+            self.loader = CTkLoader(self, cancel_command=self.cancel_callback)
+            self.job = start_writer(options, self.on_ui(self.save_notification), self.on_ui(self.show_error))
 
     def subtitle_callback(self):
         og_file_name = os.path.basename(self.file_path)
@@ -225,19 +404,31 @@ class WhisperGui(ctk.CTk):
         )
         if file_path:
             self.disable_controller()
-            self.loader = CTkLoader(self)
-            start_subtitle({"result": self.result, "audio": self.file_path, "output": file_path, "lang": self.language,
-                            "device": self.device}, self.subtitle_notification)
+            self.loader = CTkLoader(self, cancel_command=self.cancel_callback)
+            self.job = start_subtitle({"result": self.result, "audio": self.file_path, "output": file_path,
+                                       "lang": self.language, "device": self.device},
+                                      self.on_ui(self.subtitle_notification), self.on_ui(self.show_error))
 
     def start_callback(self) -> None:
         self.disable_controller()
-        self.loader = CTkLoader(self)
+        self.textbox.delete("0.0", "end")
+        self.status_label.configure(text="Transcribing...")
+        self.progress_bar.set(0)
+        self.progress_bar.grid()
+        self.progress_at = None
+        self.transcribing = True
+        self.result = {"text": "", "segments": [], "language": None}
 
         options = {"audio": self.file_path, "model": self.model_option.get().lower(),
                    "language": self.language_option.get().lower(), "task": self.task_option.get().lower(),
-                   "device": self.device_option.get().lower()}
+                   "device": self.device_option.get().lower(), "vad": bool(self.vad_switch.get()),
+                   "on_segments": lambda segments: self.stream_queue.put(("segments", segments)),
+                   "on_progress": lambda progress: self.stream_queue.put(("progress", progress))}
 
-        start_transcriber(options, self.show_results)
+        self.job = start_transcriber(options, lambda result: self.stream_queue.put(("done", result)),
+                                     lambda error: self.stream_queue.put(("error", error)))
+        self.start_btn.configure(text="Cancel", command=self.cancel_callback, state="normal")
+        self.after(250, self.poll_stream)
 
     def _select_file_callback(self) -> None:
         file_path = fd.askopenfilename(
@@ -276,6 +467,7 @@ class WhisperGui(ctk.CTk):
         self.language_option.configure(state="normal")
         self.task_option.configure(state="normal")
         self.device_option.configure(state="normal")
+        self.vad_switch.configure(state="normal")
 
     def disable_controller(self) -> None:
         self.model_dropdown.configure(state="disabled")
@@ -291,6 +483,7 @@ class WhisperGui(ctk.CTk):
         self.language_option.configure(state="disabled")
         self.task_option.configure(state="disabled")
         self.device_option.configure(state="disabled")
+        self.vad_switch.configure(state="disabled")
 
     def center_window(self, window_width, window_height) -> None:
         screen_width = self.winfo_screenwidth()
@@ -305,6 +498,7 @@ class WhisperGui(ctk.CTk):
             "language": self.language_option.get(),
             "task": self.task_option.get(),
             "device": self.device_option.get(),
+            "vad": bool(self.vad_switch.get()),
         }
         save_config(options, CONFIG_FILE)
 
@@ -0,0 +1,133 @@
+import json
+import subprocess
+
+import numpy as np
+
+from src.cache import PCM_CACHE
+from src.fingerprint import file_fingerprint
+
+SAMPLE_RATE = 16000
+PROBE_DECODE_SECONDS = 10.0
+
+
+def decode_audio(file: str, sr: int = SAMPLE_RATE, offset: float = None, duration: float = None,
+                 cancel_token: any = None) -> np.ndarray:
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if offset:
+        cmd += ["-ss", str(offset)]
+    if duration:
+        cmd += ["-t", str(duration)]
+    cmd += [
+        "-i", file,
+        "-vn",
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sr),
+        "-"
+    ]
+
+    if cancel_token is None:
+        try:
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+    else:
+        out = run_cancellable(cmd, cancel_token, "Failed to load audio")
+
+    # Whisper expects mono float32 PCM in [-1, 1].
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def load_pcm(file: str, cancel_token: any = None, use_cache: bool = True) -> np.ndarray:
+    if not use_cache:
+        return decode_audio(file, cancel_token=cancel_token)
+
+    key = f"{file_fingerprint(file)}-{SAMPLE_RATE}"
+    audio = PCM_CACHE.get(key)
+    if audio is None:
+        audio = PCM_CACHE.put(key, decode_audio(file, cancel_token=cancel_token))
+
+    return audio
+
+
+def run_cancellable(cmd: list, cancel_token: any, error_message: str = "Command failed") -> bytes:
+    cancel_token.check()
+    with subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        cancel_token.register(process)
+        try:
+            out, err = process.communicate()
+        finally:
+            cancel_token.unregister(process)
+
+    cancel_token.check()
+    if process.returncode != 0:
+        raise RuntimeError(f"{error_message}: {err.decode(errors='replace')}")
+    return out
+
+
+def probe_media(file: str) -> dict:
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=format_name,duration:stream=codec_type,codec_name,sample_rate,channels,duration",
+        "-of", "json",
+        file
+    ]
+
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        data = json.loads(out or b"{}")
+    except FileNotFoundError:
+        return {"conclusive": False, "valid": False}
+    except (subprocess.CalledProcessError, ValueError):
+        return {"conclusive": True, "valid": False}
+
+    fmt = data.get("format", {})
+    audio_streams = [stream for stream in data.get("streams", []) if stream.get("codec_type") == "audio"]
+    first = audio_streams[0] if audio_streams else {}
+
+    duration = _to_float(fmt.get("duration")) or _to_float(first.get("duration"))
+    sample_rate = int(_to_float(first.get("sample_rate")) or 0)
+
+    info = {
+        "format_name": fmt.get("format_name"),
+        "duration": duration,
+        "audio_streams": len(audio_streams),
+        "codec_name": first.get("codec_name"),
+        "sample_rate": sample_rate,
+        "channels": first.get("channels", 0),
+    }
+
+    # A container without any audio stream is definitely invalid; a missing
+    # duration or sample rate only means the header did not tell us enough.
+    info["conclusive"] = not audio_streams or bool(duration and sample_rate)
+    info["valid"] = bool(audio_streams)
+
+    return info
+
+
+def inspect_media(file: str, decode_seconds: float = PROBE_DECODE_SECONDS) -> dict:
+    info = probe_media(file)
+    if info["conclusive"]:
+        return info
+
+    try:
+        sample = decode_audio(file, duration=decode_seconds)
+    except (RuntimeError, FileNotFoundError):
+        info["valid"] = False
+        return info
+
+    info["valid"] = sample.size > 0
+    info["sample_rate"] = info.get("sample_rate") or SAMPLE_RATE
+    info["audio_streams"] = info.get("audio_streams") or int(info["valid"])
+    info.setdefault("duration", None)
+
+    return info
+
+
+def _to_float(value: any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
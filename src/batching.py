@@ -0,0 +1,160 @@
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES
+from whisper.tokenizer import get_tokenizer
+
+from src.audio import SAMPLE_RATE
+from src.cache import FEATURE_CACHE
+from src.chunking import split_on_silence
+
+WINDOW_SECONDS = 30.0
+TIME_PRECISION = 2 * HOP_LENGTH / SAMPLE_RATE
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+def batch_windows(audio: any, sr: int = SAMPLE_RATE, target_seconds: float = 25.0,
+                  max_seconds: float = WINDOW_SECONDS, hard_cuts: list = None) -> list:
+    # Windows never exceed whisper's 30 second input, so each one decodes in a single pass.
+    return split_on_silence(audio, sr, target_seconds, max_seconds, hard_cuts=hard_cuts)
+
+
+def window_mels(model: any, audios: list) -> torch.Tensor:
+    mels = [whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels) for audio in audios]
+    return torch.stack(mels)[:, :, :N_FRAMES].to(model.device)
+
+
+def window_features(model: any, audios: list, fp16: bool = True, cache_keys: list = None) -> torch.Tensor:
+    if not cache_keys:
+        return window_mels(model, audios)
+
+    features = [None] * len(audios)
+    encoder_keys = [FEATURE_CACHE.make_key("encoder", **key) for key in cache_keys]
+    for index, key in enumerate(encoder_keys):
+        cached = FEATURE_CACHE.get(key)
+        if cached is not None:
+            features[index] = torch.from_numpy(cached)
+
+    missing = [index for index, feature in enumerate(features) if feature is None]
+    if missing:
+        mels = []
+        for index in missing:
+            # The mel only depends on the audio and n_mels, so it is shared across models.
+            mel_key = FEATURE_CACHE.make_key("mel", audio=cache_keys[index]["audio"], n_mels=model.dims.n_mels,
+                                             window=cache_keys[index]["window"])
+            mel = FEATURE_CACHE.get(mel_key)
+            if mel is None:
+                mel = window_mels(model, [audios[index]])[0].cpu().numpy()
+                FEATURE_CACHE.put(mel_key, mel)
+            mels.append(torch.from_numpy(mel))
+
+        mel = torch.stack(mels).to(model.device)
+        with torch.no_grad():
+            encoded = model.embed_audio(mel.half() if fp16 else mel)
+
+        for position, index in enumerate(missing):
+            features[index] = encoded[position].cpu()
+            FEATURE_CACHE.put(encoder_keys[index], features[index].numpy())
+
+    # decode() sees (n_audio_ctx, n_audio_state) shaped input and skips the encoder.
+    return torch.stack(features).to(model.device)
+
+
+def needs_fallback(result: any, compression_ratio_threshold: float = 2.4, logprob_threshold: float = -1.0,
+                   no_speech_threshold: float = 0.6) -> bool:
+    if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold:
+        return False
+    if compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold:
+        return True
+    return logprob_threshold is not None and result.avg_logprob < logprob_threshold
+
+
+def decode_features(model: any, features: torch.Tensor, language: str = None, task: str = "transcribe",
+                    fp16: bool = True, prompt: dict = None) -> list:
+    prompt = prompt or {}
+    temperature = prompt.get("temperature")
+    temperatures = (temperature,) if temperature is not None else DEFAULT_TEMPERATURES
+    thresholds = {name: prompt[name] for name in ["compression_ratio_threshold", "logprob_threshold",
+                                                  "no_speech_threshold"] if name in prompt}
+
+    # Every window is decoded on its own, the only shared context is the user's initial prompt.
+    initial_prompt = prompt.get("initial_prompt")
+
+    results = [None] * len(features)
+    pending = list(range(len(features)))
+    for temperature in temperatures:
+        options = whisper.DecodingOptions(language=language, task=task, fp16=fp16, temperature=temperature,
+                                          prompt=initial_prompt)
+        decoded = whisper.decode(model, features[pending], options)
+
+        retry = []
+        for index, result in zip(pending, decoded):
+            results[index] = result
+            if temperature != temperatures[-1] and needs_fallback(result, **thresholds):
+                retry.append(index)
+
+        pending = retry
+        if not pending:
+            break
+
+    return results
+
+
+def decode_windows(model: any, audios: list, language: str = None, task: str = "transcribe", fp16: bool = True,
+                   prompt: dict = None, cache_keys: list = None) -> list:
+    return decode_features(model, window_features(model, audios, fp16, cache_keys), language, task, fp16, prompt)
+
+
+def parse_result(model: any, result: any, duration: float, task: str = "transcribe",
+                 no_speech_threshold: float = 0.6, logprob_threshold: float = -1.0) -> dict:
+    if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold \
+            and (logprob_threshold is None or result.avg_logprob < logprob_threshold):
+        return {"text": "", "segments": [], "language": result.language}
+
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language=result.language,
+                              task=task)
+    segments = []
+
+    def add_segment(start: float, end: float, tokens: list) -> None:
+        text = tokenizer.decode([token for token in tokens if token < tokenizer.eot])
+        if not text.strip():
+            return
+        segments.append({
+            "id": len(segments),
+            "seek": 0,
+            "start": round(start, 3),
+            "end": round(min(max(end, start), duration), 3),
+            "text": text,
+            "tokens": tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        })
+
+    # Same token walk as whisper.transcribe: pairs of consecutive timestamp tokens close a segment.
+    tokens = list(result.tokens)
+    begin = tokenizer.timestamp_begin
+    is_timestamp = [token >= begin for token in tokens]
+    slices = [index for index in range(1, len(tokens)) if is_timestamp[index - 1] and is_timestamp[index]]
+
+    if slices:
+        if is_timestamp[-2:] == [False, True]:
+            slices.append(len(tokens))
+        last = 0
+        for current in slices:
+            sliced = tokens[last:current]
+            add_segment((sliced[0] - begin) * TIME_PRECISION, (sliced[-1] - begin) * TIME_PRECISION, sliced)
+            last = current
+        # whisper.transcribe would seek back and re-decode an unfinished tail,
+        # a standalone window has no next pass so the tail runs to its end.
+        if last < len(tokens):
+            add_segment((tokens[last - 1] - begin) * TIME_PRECISION, duration, tokens[last:])
+    else:
+        timestamps = [token for token in tokens if token >= begin]
+        end = duration
+        if timestamps and timestamps[-1] != begin:
+            end = (timestamps[-1] - begin) * TIME_PRECISION
+        add_segment(0.0, end, tokens)
+
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments,
+            "language": result.language}
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from src.audio import SAMPLE_RATE
+from src.functions import DEVICES, MODEL_REQUIREMENTS, WhisperTranscriber
+from src.memory import RssSampler
+from src.model_cache import MODEL_CACHE
+from src.tracing import Trace, activate
+
+DEFAULT_LENGTHS = [10, 60, 300]
+DEFAULT_MODELS = ["tiny", "base"]
+DEFAULT_DEVICES = ["cpu", "int8"]
+MODES = ["sequential", "batched"]
+
+
+def synthetic_clip(seconds: float, seed: int = 0, sr: int = SAMPLE_RATE) -> np.ndarray:
+    # Voiced bursts (a harmonic stack with a wandering pitch) separated by
+    # pauses, so the VAD, silence splitting and batching paths all get work.
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * sr), dtype=np.float32)
+
+    position = 0
+    while position < len(audio):
+        burst = int(rng.uniform(0.4, 2.5) * sr)
+        t = np.arange(min(burst, len(audio) - position)) / sr
+        pitch = rng.uniform(90, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 6) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sr
+        voice = sum(np.sin(phase * k) / k for k in range(1, 8))
+        envelope = np.sin(np.pi * t / max(t[-1], 1e-3))
+        audio[position:position + len(t)] = 0.1 * voice * envelope + 0.003 * rng.standard_normal(len(t))
+        position += len(t) + int(rng.uniform(0.2, 1.2) * sr)
+
+    return audio
+
+
+def write_wav(path: str, audio: np.ndarray, sr: int = SAMPLE_RATE) -> str:
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return path
+
+
+def prepare_clips(directory: str, lengths: list, files: list = None) -> list:
+    # (path, synthetic) pairs, the synthetic clips carry no words to count.
+    clips = [(write_wav(os.path.join(directory, f"synthetic-{length:g}s.wav"),
+                        synthetic_clip(length, seed=int(length))), True) for length in lengths]
+    return clips + [(path, False) for path in files or []]
+
+
+def set_threads(threads: int) -> None:
+    import torch
+    torch.set_num_threads(threads)
+
+
+def run_case(clip: str, model: str, device: str, threads: int, mode: str, language: str,
+             synthetic: bool = False) -> dict:
+    set_threads(threads)
+    # Every case starts cold so load time is measured, not a cache hit.
+    MODEL_CACHE.clear()
+
+    trace = Trace(f"{model} {device} {mode}")
+    with RssSampler() as memory, activate(trace):
+        started = time.perf_counter()
+        # Exactly the requested model, without the switch to the English-only variant.
+        transcriber = WhisperTranscriber(audio_file=clip, model_size=model, device=device, language=language,
+                                         pcm_cache=False, english_model=False)
+        try:
+            result = transcriber.transcribe_batched() if mode == "batched" else transcriber.transcribe()
+        finally:
+            transcriber.release_model()
+        wall = time.perf_counter() - started
+
+    totals = trace.totals()
+    duration = len(transcriber.audio) / SAMPLE_RATE
+    inference = totals.get("inference", wall)
+    words = None if synthetic else len(re.findall(r"\w+", result["text"]))
+
+    return {
+        "clip": os.path.basename(clip),
+        "synthetic": synthetic,
+        "duration": round(duration, 2),
+        "model": transcriber.model_size,
+        "device": device,
+        "threads": threads,
+        "mode": mode,
+        "load_seconds": round(totals.get("load_model", 0.0), 3),
+        "inference_seconds": round(inference, 3),
+        "wall_seconds": round(wall, 3),
+        "rtf": round(inference / duration, 4) if duration else None,
+        "words": words,
+        "words_per_second": round(words / inference, 2) if words is not None and inference else None,
+        "peak_rss_mb": round(memory.peak / 1024 ** 2, 1),
+    }
+
+
+def machine_info() -> dict:
+    import torch
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "cuda": torch.cuda.is_available(),
+    }
+
+
+def run_benchmark(models: list, devices: list, threads: list, modes: list, lengths: list, files: list = None,
+                  language: str = "en") -> dict:
+    rows = []
+    import whisper
+
+    models = list(dict.fromkeys(models))
+    for model in [model for model in models if model not in whisper.available_models()]:
+        # WhisperTranscriber would quietly fall back to base and report it under another name.
+        print(f"[!] Skipping ({model}), not a whisper model")
+        models.remove(model)
+    if not files:
+        print("[!] No speech clips given (-f), synthetic clips only: RTF is not representative and words/sec "
+              "is left out.")
+    with tempfile.TemporaryDirectory() as directory:
+        clips = prepare_clips(directory, lengths, files)
+        for model in models:
+            for device in devices:
+                for thread_count in threads:
+                    for mode in modes:
+                        for clip, synthetic in clips:
+                            try:
+                                row = run_case(clip, model, device, thread_count, mode, language, synthetic)
+                            except Exception as e:
+                                print(f"Error: {model}/{device}/{mode} on {os.path.basename(clip)}: {e}")
+                                continue
+                            print(format_row(row))
+                            rows.append(row)
+
+    return {"machine": machine_info(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "rows": rows}
+
+
+def format_row(row: dict) -> str:
+    words = "synthetic" if row["synthetic"] else f"{row['words_per_second']} words/s"
+    return (f"{row['clip']:<24} {row['model']:<10} {row['device']:<11} {row['threads']:>2}t {row['mode']:<10} "
+            f"RTF {row['rtf']:<7} load {row['load_seconds']:>6.2f}s  peak {row['peak_rss_mb']:>7.1f}MB  "
+            f"{words}")
+
+
+def all_models() -> list:
+    return [model for models in MODEL_REQUIREMENTS.values() for model in models]
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark",
+                                     description="Measure real-time factor, load time and memory per model and mode.")
+    parser.add_argument("-m", "--models", nargs="+", default=DEFAULT_MODELS,
+                        help=f"model sizes or 'all' (default: {' '.join(DEFAULT_MODELS)})")
+    parser.add_argument("-d", "--devices", nargs="+", default=DEFAULT_DEVICES, choices=sorted(DEVICES),
+                        help=f"devices (default: {' '.join(DEFAULT_DEVICES)})")
+    parser.add_argument("-t", "--threads", nargs="+", type=int, default=[os.cpu_count() or 1],
+                        help="torch thread counts to try (default: all cores)")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--lengths", nargs="+", type=float, default=DEFAULT_LENGTHS,
+                        help="synthetic clip lengths in seconds (default: 10 60 300)")
+    parser.add_argument("-f", "--files", nargs="*", default=[],
+                        help="speech clips to include (words/sec is only reported for these)")
+    parser.add_argument("-l", "--language", default="en", help="language passed to every run (default: en)")
+    parser.add_argument("-o", "--output", default=None, help="write the table as JSON")
+    args = parser.parse_args(argv)
+
+    models = all_models() if args.models == ["all"] else args.models
+    report = run_benchmark(models, args.devices, args.threads, args.modes, args.lengths, args.files, args.language)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to: {args.output}")
+
+    return 0 if report["rows"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+CACHE_DIR = Path().home() / ".cache" / "whisper-gui"
+
+
+class DiskCache:
+    suffix = ".bin"
+    # Evicting down to this fraction of the budget leaves room for many
+    # writes before the next scan.
+    low_water = 0.9
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+        # Running size of the directory, seeded from disk on first write, so
+        # writes only pay for a directory scan when they push it over budget.
+        self._total = None
+        self._size_lock = Lock()
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def entries(self) -> list:
+        if not self.directory.is_dir():
+            return []
+        return [path for path in self.directory.iterdir() if path.is_file() and path.suffix == self.suffix]
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "bytes": sum(path.stat().st_size for path in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self) -> int:
+        removed = 0
+        for path in self.entries():
+            try:
+                path.unlink()
+                removed += 1
+            except OSError as e:
+                print(f"Error: {e}")
+
+        with self._size_lock:
+            self._total = None
+        return removed
+
+    def touch(self, path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def write_atomic(self, key: str, data: any) -> Path:
+        # An entry that does not fit under the low-water mark would be evicted
+        # by its own write, so it is not stored at all.
+        if memoryview(data).nbytes > self.max_bytes * self.low_water:
+            return None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            size = f.tell()
+
+        with self._size_lock:
+            if self._total is None:
+                self._total = self._scan_total()
+            replaced = path.stat().st_size if path.is_file() else 0
+            os.replace(temp_path, path)
+            self._total += size - replaced
+            over_budget = self._total > self.max_bytes
+
+        if over_budget:
+            self.evict()
+        return path
+
+    def _scan_total(self) -> int:
+        return sum(path.stat().st_size for path in self.entries())
+
+    def evict(self) -> None:
+        with self._size_lock:
+            # Entries are touched on every hit, so the oldest mtime is the least recently used.
+            entries = sorted(((path, path.stat()) for path in self.entries()), key=lambda entry: entry[1].st_mtime)
+            total = sum(stat.st_size for _, stat in entries)
+
+            for path, stat in entries:
+                if total <= self.max_bytes * self.low_water:
+                    break
+                try:
+                    path.unlink()
+                    total -= stat.st_size
+                except OSError as e:
+                    print(f"Error: {e}")
+
+            # Rescanned here, which also corrects drift from other processes sharing the directory.
+            self._total = total
+
+
+class ResultCache(DiskCache):
+    suffix = ".json"
+
+    @staticmethod
+    def make_key(fingerprint: str, model: str, language: str, task: str, device: str = None,
+                 prompt: dict = None, mode: dict = None) -> str:
+        parts = {
+            "fingerprint": fingerprint,
+            "model": model,
+            "language": language,
+            "task": task,
+            "device": device,
+            "prompt": prompt or {},
+            "mode": mode or {},
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> dict:
+        path = self.path_for(key)
+        if not path.is_file():
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return None
+
+        self.touch(path)
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        try:
+            self.write_atomic(key, json.dumps(result, default=float).encode("utf-8"))
+        except OSError as e:
+            print(f"Error: {e}")
+
+
+class PcmCache(DiskCache):
+    suffix = ".f32"
+
+    def get(self, key: str) -> np.ndarray:
+        path = self.path_for(key)
+        if not path.is_file():
+            return None
+
+        self.touch(path)
+        if path.stat().st_size == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        # Copy-on-write mapping: pages are shared with the OS file cache and
+        # only copied if a consumer writes into the buffer.
+        return np.memmap(path, dtype=np.float32, mode="c")
+
+    def put(self, key: str, audio: np.ndarray) -> np.ndarray:
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        try:
+            path = self.write_atomic(key, memoryview(audio).cast("B"))
+        except OSError as e:
+            print(f"Error: {e}")
+            return audio
+
+        # Too large for the budget, or already evicted by another writer: keep the in-memory copy.
+        cached = self.get(key) if path is not None and audio.size else None
+        return cached if cached is not None else audio
+
+
+class FeatureCache(DiskCache):
+    suffix = ".npz"
+
+    # Log-mel windows and encoder outputs. Recent ones live in memory, the
+    # ones pushed out of memory spill to disk, so re-running a file longer
+    # than the memory budget still hits. With use_disk every entry is
+    # written through, so features survive restarts.
+    def __init__(self, directory: Path, max_bytes: int, memory_bytes: int = 512 * 1024 ** 2, use_disk: bool = False):
+        super().__init__(directory, max_bytes)
+        self.memory_bytes = memory_bytes
+        self.use_disk = use_disk
+
+        self._memory = OrderedDict()
+        self._resident = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind: str, **parts) -> str:
+        return hashlib.sha256(json.dumps(dict(parts, kind=kind), sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> np.ndarray:
+        with self._lock:
+            features = self._memory.get(key)
+            if features is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return features
+
+        features = self._read(key)
+        with self._lock:
+            if features is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._remember(key, features)
+        return features
+
+    def put(self, key: str, features: np.ndarray) -> None:
+        if self.use_disk:
+            self._write(key, features)
+        self._remember(key, features)
+
+    def memory_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._memory), "bytes": self._resident, "max_bytes": self.memory_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+            self._resident = 0
+        return super().clear()
+
+    def _read(self, key: str) -> np.ndarray:
+        path = self.path_for(key)
+        if not path.is_file():
+            return None
+
+        try:
+            with np.load(path) as data:
+                features = data["features"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: {e}")
+            return None
+
+        self.touch(path)
+        return features
+
+    def _write(self, key: str, features: np.ndarray) -> None:
+        # Uncompressed, float features barely compress and reading them back has to be fast.
+        buffer = io.BytesIO()
+        np.savez(buffer, features=features)
+        try:
+            self.write_atomic(key, buffer.getbuffer())
+        except OSError as e:
+            print(f"Error: {e}")
+
+    def _remember(self, key: str, features: np.ndarray) -> None:
+        spilled = []
+        with self._lock:
+            if key in self._memory:
+                self._resident -= self._memory.pop(key).nbytes
+            self._memory[key] = features
+            self._resident += features.nbytes
+
+            while self._resident > self.memory_bytes and len(self._memory) > 1:
+                evicted_key, evicted = self._memory.popitem(last=False)
+                self._resident -= evicted.nbytes
+                spilled.append((evicted_key, evicted))
+
+        for evicted_key, evicted in spilled:
+            if not self.path_for(evicted_key).is_file():
+                self._write(evicted_key, evicted)
+
+
+RESULT_CACHE = ResultCache(CACHE_DIR / "results", max_bytes=256 * 1024 ** 2)
+PCM_CACHE = PcmCache(CACHE_DIR / "pcm", max_bytes=4 * 1024 ** 3)
+FEATURE_CACHE = FeatureCache(CACHE_DIR / "features", max_bytes=2 * 1024 ** 3)
@@ -0,0 +1,159 @@
+import re
+
+import numpy as np
+
+from src.audio import SAMPLE_RATE
+
+FRAME_SECONDS = 0.03
+
+
+def frame_energy_db(audio: np.ndarray, sr: int = SAMPLE_RATE, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    frame = max(1, int(sr * frame_seconds))
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    frames = np.asarray(audio[:count * frame], dtype=np.float32).reshape(count, frame)
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def silence_threshold(energy: np.ndarray, margin_db: float = 12.0, ceiling_db: float = -30.0) -> float:
+    # Track the noise floor of the recording instead of using a fixed level,
+    # so quiet rooms and noisy ones both split sensibly.
+    if energy.size == 0:
+        return ceiling_db
+    return float(min(np.percentile(energy, 10) + margin_db, ceiling_db))
+
+
+def find_silences(audio: np.ndarray, sr: int = SAMPLE_RATE, min_silence: float = 0.4, threshold_db: float = None,
+                  frame_seconds: float = FRAME_SECONDS) -> list:
+    energy = frame_energy_db(audio, sr, frame_seconds)
+    threshold = silence_threshold(energy) if threshold_db is None else threshold_db
+
+    silent = np.concatenate(([0], (energy < threshold).astype(np.int8), [0]))
+    edges = np.diff(silent)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    keep = (ends - starts) * frame_seconds >= min_silence
+    return [(start * frame_seconds, end * frame_seconds) for start, end in zip(starts[keep], ends[keep])]
+
+
+def split_on_silence(audio: np.ndarray, sr: int = SAMPLE_RATE, target_seconds: float = 120.0,
+                     max_seconds: float = 180.0, min_silence: float = 0.4, hard_cuts: list = None) -> list:
+    # Cuts that had to be made without a silence are appended to hard_cuts
+    # (as sample offsets), speech may run across those.
+    total = len(audio) / sr
+    if total <= max_seconds:
+        return [(0, len(audio))]
+
+    midpoints = np.array([(start + end) / 2 for start, end in find_silences(audio, sr, min_silence)])
+    min_seconds = target_seconds / 2
+
+    bounds = []
+    position = 0.0
+    while total - position > max_seconds:
+        candidates = midpoints[(midpoints > position + min_seconds) & (midpoints <= position + max_seconds)] \
+            if midpoints.size else midpoints
+        if candidates.size:
+            cut = float(candidates[np.argmin(np.abs(candidates - (position + target_seconds)))])
+        else:
+            cut = position + max_seconds
+            if hard_cuts is not None:
+                hard_cuts.append(int(cut * sr))
+        bounds.append((position, cut))
+        position = cut
+    bounds.append((position, total))
+
+    return [(int(start * sr), int(end * sr)) for start, end in bounds]
+
+
+def offset_segment(segment: dict, offset: float, seek_offset: int) -> dict:
+    segment = dict(segment)
+    segment["start"] = round(segment["start"] + offset, 3)
+    segment["end"] = round(segment["end"] + offset, 3)
+    if "seek" in segment:
+        segment["seek"] = segment["seek"] + seek_offset
+    if segment.get("words"):
+        segment["words"] = [dict(word, start=round(word["start"] + offset, 3), end=round(word["end"] + offset, 3))
+                            for word in segment["words"]]
+    return segment
+
+
+def merge_chunk_results(results: list, bounds: list, sr: int = SAMPLE_RATE, hard_cuts: list = None) -> dict:
+    hard_cuts = set(hard_cuts or [])
+    segments = []
+    duplicates = 0
+    overlaps = 0
+    words_removed = 0
+
+    for result, (start, _) in zip(results, bounds):
+        offset = start / sr
+        # Whisper's seek is counted in mel frames, 100 per second.
+        seek_offset = int(round(offset * 100))
+
+        for index, segment in enumerate(result.get("segments", [])):
+            segment = offset_segment(segment, offset, seek_offset)
+
+            if index == 0 and segments:
+                if _is_boundary_duplicate(segments[-1], segment):
+                    duplicates += 1
+                    continue
+                # Only a cut through speech can leave the same words on both sides, and
+                # only when both segments claim the time around the cut.
+                overlap = _word_overlap(segments[-1], segment) \
+                    if start in hard_cuts and segment["start"] < segments[-1]["end"] else 0
+                if overlap:
+                    overlaps += 1
+                    words_removed += overlap
+                    segment = _drop_leading_words(segment, overlap)
+                    if segment is None:
+                        continue
+            if segments and segment["start"] < segments[-1]["start"]:
+                segment["start"] = segments[-1]["start"]
+                segment["end"] = max(segment["end"], segment["start"])
+
+            segment["id"] = len(segments)
+            segments.append(segment)
+
+    text = "".join(segment["text"] for segment in segments)
+    language = next((result.get("language") for result in results if result.get("language")), None)
+
+    return {"text": text, "segments": segments, "language": language,
+            "chunking": {"chunks": len(bounds), "boundary_duplicates": duplicates, "boundary_overlaps": overlaps,
+                         "overlap_words_removed": words_removed}}
+
+
+def _words(text: str) -> list:
+    return re.findall(r"\w+", text.lower())
+
+
+def _word_overlap(previous: dict, segment: dict, min_words: int = 3) -> int:
+    # Speech cut by a hard split tends to show up as the same run of words
+    # at the end of one chunk and the start of the next.
+    tail, head = _words(previous["text"]), _words(segment["text"])
+    for size in range(min(len(tail), len(head)), min_words - 1, -1):
+        if tail[-size:] == head[:size]:
+            return size
+    return 0
+
+
+def _drop_leading_words(segment: dict, count: int) -> dict:
+    matches = list(re.finditer(r"\w+", segment["text"]))
+    if count >= len(matches):
+        return None
+
+    # Keep the leading space convention of the segment, CJK text has none.
+    prefix = " " if segment["text"].startswith(" ") else ""
+    segment = dict(segment, text=prefix + segment["text"][matches[count - 1].end():].lstrip(" ,.;:!?-"))
+    words = segment.get("words")
+    if words and len(words) > count:
+        segment["words"] = words[count:]
+        segment["start"] = segment["words"][0]["start"]
+    return segment
+
+
+def _is_boundary_duplicate(previous: dict, segment: dict, tolerance: float = 1.0) -> bool:
+    overlaps = segment["start"] < previous["end"] + tolerance
+    return overlaps and _words(previous["text"]) == _words(segment["text"])
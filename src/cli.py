@@ -0,0 +1,164 @@
+import argparse
+import os
+import sys
+from queue import Empty, Queue
+
+from whisper.utils import get_writer
+
+from src.cache import FEATURE_CACHE
+from src.functions import MEDIA_EXTENSIONS, OUTPUT_FORMATS, WRITER_OPTIONS, start_batch, start_transcriber
+from src.jobs import JOB_SCHEDULER
+from src.model_cache import MODEL_CACHE
+from src.progress import format_progress
+from src.tracing import dump_chrome_trace
+
+
+def collect_inputs(paths: list, recursive: bool = False) -> list:
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+        elif os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS)
+                if not recursive:
+                    break
+        else:
+            print(f"[!] Skipping ({path}), not a file or directory")
+    return files
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli",
+                                     description="Transcribe or translate audio/video files with OpenAI Whisper.")
+    parser.add_argument("inputs", nargs="+", help="audio/video files or directories")
+    parser.add_argument("-m", "--model", default="base", help="model size (default: base)")
+    parser.add_argument("-l", "--language", default="auto", help="spoken language or 'auto' (default: auto)")
+    parser.add_argument("-t", "--task", default="transcribe", choices=["transcribe", "translate"])
+    parser.add_argument("-d", "--device", default="cpu", help="gpu, cpu or int8 (default: cpu)")
+    parser.add_argument("-f", "--format", default="srt", choices=OUTPUT_FORMATS, help="output format (default: srt)")
+    parser.add_argument("-o", "--output-dir", default=None, help="output directory (default: next to each input)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="descend into sub directories")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the result cache")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="worker processes, each with its own model (0: one per --threads cores)")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per worker (default: cores/workers)")
+    parser.add_argument("--vad", action="store_true", help="skip non-speech regions before transcribing")
+    parser.add_argument("--chunked", action="store_true",
+                        help="split each file at silences and spread the chunks over the workers instead")
+    parser.add_argument("--batched", action="store_true",
+                        help="decode several 30 second windows per forward pass (no cross-window conditioning)")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="windows or clips per batch with --batched/--pack (default: 8)")
+    parser.add_argument("--disk-features", action="store_true",
+                        help="also keep mel and encoder features on disk so later runs skip the encoder")
+    parser.add_argument("--trace", default=None, metavar="FILE",
+                        help="write per-stage timings of every job as Chrome trace-event JSON")
+    parser.add_argument("--pack", action="store_true",
+                        help="pack clips of 30 seconds or less from different files into shared batches")
+    return parser
+
+
+def print_progress(file_path: str) -> any:
+    name = os.path.basename(file_path)
+
+    def callback(progress: dict) -> None:
+        end = "\n" if progress["processed"] >= progress["total"] else ""
+        print(f"\r    {name}: {format_progress(progress)}", end=end, flush=True)
+
+    return callback
+
+
+def iter_results(options_list: list, workers: int = 1, threads: int = None, chunked: bool = False,
+                 pack: bool = False, batch_size: int = 8):
+    if not pack and (chunked or (workers == 1 and threads is None)):
+        jobs = [start_transcriber(options) for options in options_list]
+        for index, job in enumerate(jobs):
+            try:
+                yield index, job.wait(), None
+            except Exception as e:
+                yield index, None, e
+        return
+
+    # One job for the whole pack or pool run, streaming a result per file.
+    results = Queue()
+    job = start_batch({"options_list": options_list, "pool": not pack, "workers": workers or None,
+                       "threads": threads, "batch_size": batch_size}, results.put)
+    reported = set()
+    while True:
+        try:
+            index, result, error = results.get(timeout=0.2)
+        except Empty:
+            if job.done() and results.empty():
+                break
+            continue
+        reported.add(index)
+        yield index, result, error
+
+    for index in range(len(options_list)):
+        if index not in reported:
+            yield index, None, job.error or RuntimeError("No result")
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    files = collect_inputs(args.inputs, args.recursive)
+    if not files:
+        print("[!] No input files found.")
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    FEATURE_CACHE.use_disk = args.disk_features
+
+    options_list = [{"audio": file_path, "model": args.model.lower(), "language": args.language.lower(),
+                     "task": args.task, "device": args.device.lower(), "use_cache": not args.no_cache,
+                     "chunked": args.chunked, "workers": args.workers or None, "threads": args.threads,
+                     "vad": args.vad, "batched": args.batched, "batch_size": args.batch_size,
+                     "on_progress": print_progress(file_path)}
+                    for file_path in files]
+    if args.pack or (not args.chunked and (args.workers != 1 or args.threads is not None)):
+        # Progress callbacks cannot cross into worker processes, and packed clips finish a batch at a time.
+        for options in options_list:
+            options.pop("on_progress")
+
+    try:
+        failed = write_results(args, files, iter_results(options_list, args.workers, args.threads, args.chunked,
+                                                         args.pack, args.batch_size))
+    except KeyboardInterrupt:
+        print("\n[!] Cancelling...")
+        JOB_SCHEDULER.cancel_all()
+        return 130
+
+    print(f"Done: {len(files) - failed} succeeded, {failed} failed")
+    if args.pack or args.chunked or (args.workers == 1 and args.threads is None):
+        stats = MODEL_CACHE.stats()
+        print(f"Model cache hits: {stats['hits']}, misses: {stats['misses']}")
+
+    if args.trace:
+        print(f"Trace written to: {dump_chrome_trace([job.trace for job in JOB_SCHEDULER.jobs()], args.trace)}")
+
+    return 1 if failed else 0
+
+
+def write_results(args: argparse.Namespace, files: list, results: any) -> int:
+    failed = 0
+    for done, (index, result, error) in enumerate(results, start=1):
+        file_path = files[index]
+        print(f"[{done}/{len(files)}] {file_path}")
+        if error is not None:
+            print(f"Error: {error}")
+            failed += 1
+            continue
+
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(file_path))
+        writer = get_writer(args.format, output_dir)
+        writer(result, file_path, dict(WRITER_OPTIONS))
+
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
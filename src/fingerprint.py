@@ -0,0 +1,64 @@
+import hashlib
+import os
+from collections import OrderedDict
+from threading import Lock
+
+BLOCK_SIZE = 1024 * 1024
+SAMPLE_BLOCKS = 16
+MEMO_SIZE = 1024
+
+_memo = OrderedDict()
+_memo_lock = Lock()
+
+
+def file_fingerprint(file_path: str, full: bool = False, block_size: int = BLOCK_SIZE,
+                     samples: int = SAMPLE_BLOCKS) -> str:
+    stat = os.stat(file_path)
+    memo_key = (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns, full, block_size, samples)
+
+    with _memo_lock:
+        if memo_key in _memo:
+            _memo.move_to_end(memo_key)
+            return _memo[memo_key]
+
+    # Small files are cheaper to hash completely than to seek around in.
+    if full or stat.st_size <= block_size * (samples + 2):
+        fingerprint = "full-" + _hash_full(file_path, block_size)
+    else:
+        fingerprint = "sampled-" + _hash_sampled(file_path, stat.st_size, block_size, samples)
+
+    with _memo_lock:
+        _memo[memo_key] = fingerprint
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+
+    return fingerprint
+
+
+def clear_memo() -> None:
+    with _memo_lock:
+        _memo.clear()
+
+
+def _hash_full(file_path: str, block_size: int) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _hash_sampled(file_path: str, size: int, block_size: int, samples: int) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(size).encode())
+
+    # Head and tail catch container headers/indexes, the strided blocks catch edits in the payload.
+    stride = (size - 2 * block_size) // (samples + 1)
+    offsets = [0] + [block_size + stride * (i + 1) - block_size // 2 for i in range(samples)] + [size - block_size]
+
+    with open(file_path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            digest.update(f.read(block_size))
+
+    return digest.hexdigest()
@@ -1,25 +1,27 @@
+import difflib
 import json
 import os
+import time
 import webbrowser
 from pathlib import Path
-from threading import Thread
 
-import customtkinter as ctk
-import pynvml
-import whisper
-from PIL import Image
-from pydub import AudioSegment
-from whisper.utils import get_writer
+import numpy as np
+
+from src.audio import SAMPLE_RATE, decode_audio, inspect_media, load_pcm, run_cancellable
+from src.cache import RESULT_CACHE
+from src.chunking import merge_chunk_results, offset_segment, split_on_silence
+from src.fingerprint import file_fingerprint
+from src.jobs import JOB_SCHEDULER, CancelToken, Job, JobCancelled
+from src.memory import MEMORY_CALIBRATION
+from src.model_cache import INT8_DEVICE, MODEL_CACHE
+from src.parallel import run_parallel, transcribe_files, worker_layout
+from src.progress import ProgressTracker, window_progress
+from src.tracing import span
+from src.vad import collapse_non_speech, detect_speech, remap_segments, speech_stats
 
 CURRENT_PATH = os.path.dirname(os.path.realpath(__file__))
 DOWNLOAD_DIR = Path().home() / "Downloads"
 APP_VERSION = "Version 1.0.0"
-ICONS = {
-    "settings": ctk.CTkImage(light_image=Image.open(f"{CURRENT_PATH}\\icons\\settings.png"),
-                             dark_image=Image.open(f"{CURRENT_PATH}\\icons\\settings.png"), size=(25, 25)),
-    "folder": ctk.CTkImage(light_image=Image.open(f"{CURRENT_PATH}\\icons\\folder.png"),
-                           dark_image=Image.open(f"{CURRENT_PATH}\\icons\\folder.png"), size=(18, 18))
-}
 
 LANGUAGE_VALUES = [
     "Auto",
@@ -154,9 +156,41 @@ BUTTONS = {
     "font": FONTS["btn"]
 }
 
+MEDIA_EXTENSIONS = [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".webm", ".flv",
+                    ".mp3", ".wav", ".flac", ".aac", ".ogg", ".wma", ".m4a"]
+
+OUTPUT_FORMATS = ["txt", "srt", "vtt", "tsv", "json", "all"]
 
-def change_theme(new_theme):
-    ctk.set_appearance_mode(new_theme)
+DEVICES = {
+    "gpu": "cuda",
+    "cuda": "cuda",
+    "cpu": "cpu",
+    "cpu (int8)": INT8_DEVICE,
+    "int8": INT8_DEVICE
+}
+
+# GPU memory in GB each model needs.
+MODEL_REQUIREMENTS = {
+    10: ["large", "large-v1", "large-v2", "large-v3"],
+    5: ["medium", "medium.en"],
+    2: ["small", "small.en"],
+    1: ["tiny", "base", "tiny.en", "base.en"]
+}
+
+# Parameters (millions) and a rough inference working set (MB) per model family.
+MODEL_FOOTPRINT = {
+    "tiny": (39, 300),
+    "base": (74, 400),
+    "small": (244, 800),
+    "medium": (769, 1600),
+    "large": (1550, 3000)
+}
+
+WRITER_OPTIONS = {
+    'max_line_width': None,
+    'max_line_count': None,
+    'highlight_words': False
+}
 
 
 def help_page() -> None:
@@ -164,6 +198,8 @@ def help_page() -> None:
 
 
 def check_gpu() -> dict:
+    import pynvml
+
     pynvml.nvmlInit()
     device_count = pynvml.nvmlDeviceGetCount()
     cuda = device_count > 0
@@ -175,20 +211,24 @@ def check_gpu() -> dict:
     else:
         total_mem_gb = 0
 
-    model_req = {
-        10: ["large", "large-v1", "large-v2", "large-v3"],
-        5: ["medium", "medium.en"],
-        2: ["small", "small.en"],
-        1: ["tiny", "base", "tiny.en", "base.en"]
-    }
-
-    models_list = [model for req, models in model_req.items() if total_mem_gb >= req for model in models]
+    models_list = [model for req, models in MODEL_REQUIREMENTS.items() if total_mem_gb >= req for model in models]
 
     pynvml.nvmlShutdown()
 
     return {"models": models_list, "cuda": cuda}
 
 
+def filter_values(values: list, query: str, threshold: float = 0.75) -> list:
+    query = query.lower()
+    matches = []
+    for value in values:
+        text = value.lower()
+        # The prefix test is far cheaper than SequenceMatcher and decides most values.
+        if text.startswith(query) or difflib.SequenceMatcher(None, text[:len(query)], query).ratio() > threshold:
+            matches.append(value)
+    return matches
+
+
 def merge_dicts(d1, d2) -> dict:
     for k, v in d1.items():
         if k in d2 and isinstance(v, dict) and isinstance(d2[k], dict):
@@ -235,20 +275,234 @@ def reset_config(filename: str):
         "model": "base",
         "language": "auto",
         "task": "transcribe",
-        "device": "cpu"
+        "device": "cpu",
+        "preload": True,
+        "preload_english": False
     }
 
     save_config(default_settings, filename)
 
 
+def estimate_transcription_memory(options: dict) -> dict:
+    family = options["model"].split(".")[0].split("-")[0]
+    parameters, working_mb = MODEL_FOOTPRINT.get(family, MODEL_FOOTPRINT["base"])
+    device = DEVICES.get(options["device"])
+
+    # Host RAM per parameter while loading: fp32 on the CPU, the fp32 copy
+    # plus its int8 replacement while quantizing, and only the staging copy
+    # for CUDA, where weights and activations end up in GPU memory.
+    weights = parameters * 1e6 * {"cuda": 2, INT8_DEVICE: 5}.get(device, 4)
+    working = working_mb * 1024 ** 2 * (0.25 if device == "cuda" else 1)
+    if options.get("preload"):
+        # Every preloaded model that is not resident yet is loaded by this job.
+        weights *= sum(not MODEL_CACHE.is_loaded(name, device=device)
+                       for name in preload_models(options["model"], options.get("language"),
+                                                  options.get("preload_english", False)))
+    elif any(MODEL_CACHE.is_loaded(name, device=device) for name in [options["model"], f"{options['model']}.en"]):
+        weights = 0
+
+    duration = 0.0
+    if options.get("audio") and os.path.isfile(options["audio"]):
+        duration = inspect_media(options["audio"]).get("duration") or 0.0
+    # s16 pipe output plus the float32 copy, and the condensed copy with VAD.
+    audio = duration * SAMPLE_RATE * (10 if options.get("vad") else 6)
+
+    if options.get("chunked") and (options.get("workers") or 1) > 1:
+        # Every worker process loads its own model.
+        weights = parameters * 1e6 * 4 * options["workers"]
+        working *= options["workers"]
+
+    key = f"{family}/{device or 'auto'}"
+    raw = int(weights + working + audio)
+    return {"key": key, "raw": raw, "bytes": int(raw * MEMORY_CALIBRATION.factor(key))}
+
+
 def transcriber_task(options: dict = None, callback: any = None) -> None:
+    callback(run_transcription(options))
+
+
+def transcription_mode(options: dict) -> str:
+    if options.get("on_segments"):
+        return "stream"
+    if options.get("chunked"):
+        return "chunked"
+    return "batched" if options.get("batched") else "sequential"
+
+
+def run_transcription(options: dict) -> dict:
+    prompt = WhisperTranscriber.get_valid_prompts(options.get("prompt"))
+
+    cache_key = None
+    if options.get("use_cache", True) and os.path.isfile(options["audio"]):
+        with span("cache_lookup"):
+            cache_key = RESULT_CACHE.make_key(file_fingerprint(options["audio"]), options["model"],
+                                              options["language"], options["task"], options["device"], prompt,
+                                              {"vad": options.get("vad", False), "mode": transcription_mode(options)})
+            cached_result = RESULT_CACHE.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
     transcriber = WhisperTranscriber(audio_file=options["audio"], model_size=options["model"],
-                                     device=options["device"], language=options["language"], task=options["task"])
-    get_result = transcriber.transcribe()
-    callback(get_result)
+                                     device=options["device"], language=options["language"], task=options["task"],
+                                     prompt=prompt, detect_windows=options.get("detect_windows", 1),
+                                     on_progress=options.get("on_progress"), cancel_token=options.get("cancel_token"),
+                                     vad=options.get("vad", False), pcm_cache=options.get("use_cache", True))
+    try:
+        if options.get("on_segments"):
+            get_result = transcriber.transcribe_stream(options["on_segments"])
+        elif options.get("chunked"):
+            get_result = transcriber.transcribe_chunked(options.get("workers"), options.get("threads"))
+        elif options.get("batched"):
+            get_result = transcriber.transcribe_batched(options.get("batch_size", 8))
+        else:
+            get_result = transcriber.transcribe()
+    finally:
+        transcriber.release_model()
+
+    if cache_key:
+        with span("cache_store"):
+            RESULT_CACHE.put(cache_key, get_result)
+
+    return get_result
+
+
+def transcribe_clips(options_list: list, batch_size: int = 16, cancel_token: any = None):
+    import whisper
+    from whisper.audio import N_SAMPLES
+
+    from src.batching import decode_windows, parse_result
+
+    # Model, device, language, task and prompt are taken from the first
+    # entry, a packed run shares one warm model across every clip.
+    options = options_list[0]
+    prompt = WhisperTranscriber.get_valid_prompts(options.get("prompt"))
+    device = DEVICES.get(options["device"])
+    fp16 = device not in ["cpu", INT8_DEVICE]
+    language = None if options["language"] == "auto" else options["language"]
+
+    model_size = options["model"] if options["model"] in whisper.available_models() else "base"
+    if language in ["en", "english"] and not model_size.startswith("large") and not model_size.endswith(".en"):
+        model_size += ".en"
+    if model_size.endswith(".en"):
+        language = "en"
+
+    model = None
+    thresholds = {name: prompt[name] for name in ["no_speech_threshold", "logprob_threshold"] if name in prompt}
+
+    def decode_batch(batch: list):
+        nonlocal model
+        if model is None:
+            model = MODEL_CACHE.acquire(model_size, device=device)
+
+        keys = [{"audio": audio_key, "model": model_size, "device": device, "fp16": fp16,
+                 "window": [0, len(audio)]} for _, audio, _, audio_key in batch]
+        try:
+            decoded = decode_windows(model, [audio for _, audio, _, _ in batch], language, options["task"], fp16,
+                                     prompt, keys if all(key["audio"] for key in keys) else None)
+        except Exception as e:
+            for index, _, _, _ in batch:
+                yield index, None, e
+            return
+
+        for (index, audio, cache_key, _), decoded_result in zip(batch, decoded):
+            result = parse_result(model, decoded_result, len(audio) / SAMPLE_RATE, options["task"], **thresholds)
+            if cache_key:
+                RESULT_CACHE.put(cache_key, result)
+            yield index, result, None
+
+    # Clips are decoded as soon as a batch fills, so results arrive early and
+    # only one batch of PCM is held at a time.
+    batch = []
+    try:
+        for index, clip_options in enumerate(options_list):
+            if cancel_token:
+                cancel_token.check()
+
+            use_cache = clip_options.get("use_cache", True)
+            cache_key = None
+            if use_cache and os.path.isfile(clip_options["audio"]):
+                cache_key = RESULT_CACHE.make_key(file_fingerprint(clip_options["audio"]), options["model"],
+                                                  options["language"], options["task"], options["device"], prompt,
+                                                  {"vad": False, "mode": "batched"})
+                cached_result = RESULT_CACHE.get(cache_key)
+                if cached_result is not None:
+                    yield index, cached_result, None
+                    continue
+
+            try:
+                audio = WhisperTranscriber.load_audio(clip_options["audio"], cancel_token, use_cache)
+            except Exception as e:
+                yield index, None, e
+                continue
+
+            if len(audio) > N_SAMPLES:
+                # Longer files still go through the batched path, just on their own.
+                try:
+                    yield index, run_transcription(dict(clip_options, batched=True, cancel_token=cancel_token)), None
+                except Exception as e:
+                    yield index, None, e
+                continue
+
+            batch.append((index, audio, cache_key, file_fingerprint(clip_options["audio"]) if use_cache else None))
+            if len(batch) >= max(1, batch_size):
+                yield from decode_batch(batch)
+                batch = []
+
+        if batch:
+            if cancel_token:
+                cancel_token.check()
+            yield from decode_batch(batch)
+    finally:
+        if model is not None:
+            MODEL_CACHE.release(model_size, device=device)
+
+
+def preload_models(model_size: str, language: str = None, with_english: bool = False) -> list:
+    english = model_size if model_size.startswith("large") or model_size.endswith(".en") else f"{model_size}.en"
+    if language in ["en", "english"]:
+        return [english]
+    if language == "auto" and with_english and english != model_size:
+        # Auto detects with the multilingual model, then switches to the
+        # English-only one when the audio turns out to be English. Loading
+        # both up front doubles the memory, so it is opt-in; otherwise the
+        # English model loads once detection has picked it.
+        return [model_size, english]
+    return [model_size]
+
+
+def preload_model(options: dict = None, callback: any = None) -> None:
+    import whisper
+
+    model_size = options["model"] if options["model"] in whisper.available_models() else "base"
+    device = DEVICES.get(options["device"])
+
+    started = time.perf_counter()
+    models = preload_models(model_size, options.get("language"), options.get("preload_english", False))
+    for name in models:
+        model = MODEL_CACHE.get(name, device=device)
+        options["cancel_token"].check()
+
+        # One second of silence is enough to run the encoder and a few decoder
+        # steps, which pays the allocator and kernel warm-up before the first job.
+        model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="en",
+                         fp16=device not in ["cpu", INT8_DEVICE], temperature=0.0)
+        options["cancel_token"].check()
+
+    callback({"model": " + ".join(models), "device": options["device"], "seconds": time.perf_counter() - started})
+
+
+def transcribe_chunk(payload: dict) -> dict:
+    model = MODEL_CACHE.get(payload["model"], device=payload["device"], download_root=payload["download_root"])
+    return model.transcribe(payload["audio"], language=payload["language"], task=payload["task"],
+                            fp16=payload.get("fp16", True), **payload["prompt"])
 
 
 def subtitles_writer(options: dict = None, callback: any = None) -> None:
+    from whisper.utils import get_writer
+
+    if options.get("cancel_token"):
+        options["cancel_token"].check()
+
     file_path = options["output_dir"]
     result = options["result"]
     audio_file = options["audio_file"]
@@ -257,36 +511,35 @@ def subtitles_writer(options: dict = None, callback: any = None) -> None:
     file_extension = selected_extension[1]
     dir_name, get_file_name = os.path.split(file_path)
 
-    default_options = {
-        'max_line_width': None,
-        'max_line_count': None,
-        'highlight_words': False
-    }
-
-    if file_extension == ".srt":
-        writer = get_writer("srt", dir_name)
-        writer(result, audio_file,
-               default_options)
-    elif file_extension == ".txt":
-        txt_writer = get_writer("txt", dir_name)
-        txt_writer(result, audio_file, default_options)
-    elif file_extension == ".vtt":
-        vtt_writer = get_writer("vtt", dir_name)
-        vtt_writer(result, audio_file, default_options)
-    elif file_extension == ".tsv":
-        tsv_writer = get_writer("tsv", dir_name)
-        tsv_writer(result, audio_file, default_options)
-    elif file_extension == ".json":
-        json_writer = get_writer("json", dir_name)
-        json_writer(result, audio_file, default_options)
-    elif file_extension == ".all":
-        all_writer = get_writer("all", dir_name)
-        all_writer(result, audio_file, default_options)
+    default_options = dict(WRITER_OPTIONS)
+
+    with span("write_subtitles", path=file_path):
+        if file_extension == ".srt":
+            writer = get_writer("srt", dir_name)
+            writer(result, audio_file,
+                   default_options)
+        elif file_extension == ".txt":
+            txt_writer = get_writer("txt", dir_name)
+            txt_writer(result, audio_file, default_options)
+        elif file_extension == ".vtt":
+            vtt_writer = get_writer("vtt", dir_name)
+            vtt_writer(result, audio_file, default_options)
+        elif file_extension == ".tsv":
+            tsv_writer = get_writer("tsv", dir_name)
+            tsv_writer(result, audio_file, default_options)
+        elif file_extension == ".json":
+            json_writer = get_writer("json", dir_name)
+            json_writer(result, audio_file, default_options)
+        elif file_extension == ".all":
+            all_writer = get_writer("all", dir_name)
+            all_writer(result, audio_file, default_options)
 
     callback(f"File exported as: {file_path}")
 
 
 def subtitle_to_video(options: dict, callback: any) -> None:
+    from whisper.utils import get_writer
+
     result = options["result"]
     audio = options["audio"]
     output = options["output"]
@@ -301,96 +554,350 @@ def subtitle_to_video(options: dict, callback: any) -> None:
         writer = get_writer("srt", ".")
         writer(result, temp_file_name, {"highlight_words": True, "max_line_count": 50, "max_line_width": 3})
 
+        output_path = os.path.join(dir_name, file_name)
         if file_extension[1] == ".mkv":
-            os.system(
-                "ffmpeg -i {} -i {} -map 0 -map 1 -c copy -disposition:s:0 default -metadata:s:s:0 language={} {} -y".format(
-                    '"' + audio + '"',
-                    temp_file_name,
-                    lang,
-                    os.path.join('"' + dir_name, file_name + '"'),
-                )
-            )
+            cmd = ["ffmpeg", "-i", audio, "-i", temp_file_name, "-map", "0", "-map", "1", "-c", "copy",
+                   "-disposition:s:0", "default", "-metadata:s:s:0", f"language={lang}", output_path, "-y"]
         else:
             if device == "cuda":
-                os.system(
-                    "ffmpeg -i {} -c:v h264_nvenc -vf subtitles={} {} -y".format(
-                        '"' + audio + '"',
-                        temp_file_name,
-                        os.path.join('"' + dir_name, file_name + '"'),
-                    )
-                )
+                cmd = ["ffmpeg", "-i", audio, "-c:v", "h264_nvenc", "-vf", f"subtitles={temp_file_name}",
+                       output_path, "-y"]
             else:
-                os.system(
-                    "ffmpeg -i {} -vf subtitles={} {} -y".format(
-                        '"' + audio + '"',
-                        temp_file_name,
-                        os.path.join('"' + dir_name, file_name + '"'),
-                    )
-                )
+                cmd = ["ffmpeg", "-i", audio, "-vf", f"subtitles={temp_file_name}", output_path, "-y"]
 
-        os.remove(os.path.join(".", temp_file_name))
+        # Cancelling terminates the ffmpeg child and removes the half-written output.
+        try:
+            with span("ffmpeg_burn_in"):
+                run_cancellable(cmd, options.get("cancel_token") or CancelToken(), "Failed to add subtitles")
+        except JobCancelled:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        finally:
+            os.remove(os.path.join(".", temp_file_name))
 
         callback(output)
 
 
-def start_transcriber(options: dict = None, callback: any = None) -> None:
-    Thread(target=transcriber_task, args=(options, callback), daemon=True).start()
+def start_transcriber(options: dict = None, callback: any = None, error_callback: any = None,
+                      priority: int = 0) -> Job:
+    return JOB_SCHEDULER.submit(transcriber_task, options, callback, error_callback, priority,
+                                memory=estimate_transcription_memory)
+
+
+def estimate_batch_memory(options: dict) -> dict:
+    # Pooled runs load one model per worker process, packed clips share one
+    # model; either way audio is only held a file or a batch at a time.
+    largest = max(options["options_list"],
+                  key=lambda item: os.path.getsize(item["audio"]) if os.path.isfile(item["audio"]) else 0)
+    first = dict(largest, chunked=options.get("pool", False))
+    if first["chunked"]:
+        first["workers"] = worker_layout(options.get("workers"), options.get("threads"))[0]
+    return estimate_transcription_memory(first)
+
+
+def batch_task(options: dict = None, callback: any = None) -> None:
+    # Results are delivered one file at a time as (index, result, error).
+    if options.get("pool"):
+        results = transcribe_files(options["options_list"], options.get("workers"), options.get("threads"),
+                                   options["cancel_token"])
+    else:
+        results = transcribe_clips(options["options_list"], options.get("batch_size", 16), options["cancel_token"])
+
+    for item in results:
+        callback(item)
+
+
+def start_batch(options: dict = None, callback: any = None, error_callback: any = None, priority: int = 0) -> Job:
+    return JOB_SCHEDULER.submit(batch_task, options, callback, error_callback, priority,
+                                name="pool" if options.get("pool") else "pack", memory=estimate_batch_memory)
+
 
+def start_preload(options: dict = None, callback: any = None, error_callback: any = None) -> Job:
+    # Lowest priority, a job the user starts in the meantime runs first.
+    return JOB_SCHEDULER.submit(preload_model, dict(options, preload=True), callback, error_callback, priority=-10,
+                                memory=estimate_transcription_memory)
 
-def start_writer(options: dict = None, callback: any = None) -> None:
-    Thread(target=subtitles_writer, args=(options, callback), daemon=True).start()
 
+def start_writer(options: dict = None, callback: any = None, error_callback: any = None, priority: int = 0) -> Job:
+    return JOB_SCHEDULER.submit(subtitles_writer, options, callback, error_callback, priority)
 
-def start_subtitle(options: dict = None, callback: any = None) -> None:
-    Thread(target=subtitle_to_video, args=(options, callback), daemon=True).start()
+
+def start_subtitle(options: dict = None, callback: any = None, error_callback: any = None,
+                   priority: int = 0) -> Job:
+    return JOB_SCHEDULER.submit(subtitle_to_video, options, callback, error_callback, priority)
 
 
 class WhisperTranscriber:
     def __init__(self, audio_file: str = None, model_size: str = "base", download_root: str = None,
                  language: str = "auto", task: str = "transcribe",
-                 prompt: dict = None, device: str = None):
+                 prompt: dict = None, device: str = None, audio: np.ndarray = None, detect_windows: int = 1,
+                 on_progress: any = None, cancel_token: any = None, vad: bool = False, pcm_cache: bool = True,
+                 english_model: bool = True):
+
+        self.cancel_token = cancel_token
 
         if not audio_file:
             raise ValueError("[!] Audio file not provided!")
         else:
-            is_valid = self.validate_file(audio_file)
-            if not is_valid:
+            with span("probe"):
+                self.media_info = self.probe_file(audio_file)
+            if not self.media_info["valid"]:
                 raise ValueError("Error, file is not valid")
 
+        with span("load_audio"):
+            self.audio = audio if audio is not None else self.load_audio(audio_file, cancel_token, pcm_cache)
+        # Identifies the samples for the feature cache; in-memory audio has no stable identity.
+        self.audio_key = file_fingerprint(audio_file) if audio is None and pcm_cache else None
+        self.timeline = None
+        self.vad_stats = None
+        if vad:
+            with span("vad"):
+                self.apply_vad()
+
+        import whisper
+
         self.available_models = whisper.available_models()
 
         self.audio_file = audio_file
         self.model_size = model_size if model_size in self.available_models else "base"
         self.download_root = download_root if download_root and os.path.isdir(download_root) else None
-        self.language = self.detect_language() if language == 'auto' else language
+        self.device = DEVICES.get(device)
+        self.fp16 = self.device not in ["cpu", INT8_DEVICE]
+        with span("detect_language"):
+            self.language = self.detect_language(detect_windows) if language == 'auto' else language
         self.task = "transcribe" if task == 'translate' and self.language in ['en', 'english'] else task
         self.prompt = self.get_valid_prompts(prompt)
-        self.device = device if device in ["gpu", "cpu"] else None
+        self.check_cancelled()
 
-        if self.language in ['en', 'english'] and self.model_size not in ["large", "large-v1", "large-v2", "large-3"]:
+        if english_model and self.language in ['en', 'english'] and self.model_size not in ["large", "large-v1", "large-v2", "large-3"] \
+                and not self.model_size.endswith(".en"):
             self.model_size += '.en'
             print("[!] Using english only model.")
 
-        self.load_model = whisper.load_model(self.model_size, device=self.device, download_root=self.download_root)
+        with span("load_model", model=self.model_size, device=self.device,
+                  cached=MODEL_CACHE.is_loaded(self.model_size, self.device, self.download_root)):
+            # Pinned until release_model(), so a long job cannot idle out its own model.
+            self.load_model = MODEL_CACHE.acquire(self.model_size, device=self.device,
+                                                  download_root=self.download_root)
+        self.pinned = True
+        try:
+            self.check_cancelled()
+        except Exception:
+            self.release_model()
+            raise
 
+        self.on_progress = on_progress
+        self.progress = None
         self.result = None
 
-    def transcribe(self) -> dict:
-        result = self.load_model.transcribe(self.audio_file, language=self.language, task=self.task, **self.prompt)
+    def release_model(self) -> None:
+        if self.pinned:
+            self.pinned = False
+            MODEL_CACHE.release(self.model_size, device=self.device, download_root=self.download_root)
+
+    def apply_vad(self) -> None:
+        regions = detect_speech(self.audio)
+        self.vad_stats = speech_stats(regions, len(self.audio))
+        if not regions:
+            print("[!] No speech detected, transcribing the whole file.")
+            return
+
+        # Inference only sees the speech regions, timestamps are mapped back in finish_result.
+        self.audio, self.timeline = collapse_non_speech(self.audio, regions)
+        if self.audio_key:
+            self.audio_key += "-vad"
+        print(f"[!] Skipping {self.vad_stats['skipped']:.1f}s of non-speech "
+              f"({self.vad_stats['skipped_ratio']:.0%} of the audio).")
+
+    def finish_result(self, result: dict) -> dict:
+        if self.timeline:
+            result = dict(result, segments=remap_segments(result["segments"], self.timeline))
+        if self.vad_stats:
+            result["vad"] = self.vad_stats
         self.result = result
         return result
 
-    def detect_language(self) -> str:
-        model = whisper.load_model("tiny")
-        audio = whisper.load_audio(self.audio_file)
-        audio = whisper.pad_or_trim(audio)
+    def check_cancelled(self) -> None:
+        if self.cancel_token:
+            self.cancel_token.check()
+
+    def start_progress(self) -> ProgressTracker:
+        self.progress = ProgressTracker(len(self.audio) / SAMPLE_RATE, self.on_progress)
+        self.progress.update(0.0)
+        return self.progress
 
-        mel = whisper.log_mel_spectrogram(audio).to(model.device)
+    def transcribe(self) -> dict:
+        from whisper.audio import FRAMES_PER_SECOND
+
+        progress = self.start_progress()
+
+        def on_window(frames: int) -> None:
+            progress.advance(frames / FRAMES_PER_SECOND)
+            # Raising here stops whisper before it decodes the next window.
+            self.check_cancelled()
+
+        with span("inference", mode="sequential"), window_progress(on_window):
+            result = self.load_model.transcribe(self.audio, language=self.language, task=self.task, fp16=self.fp16,
+                                                **self.prompt)
+        progress.finish()
+        return self.finish_result(result)
+
+    def transcribe_chunked(self, workers: int = None, threads: int = None, target_seconds: float = 120.0,
+                           max_seconds: float = 180.0) -> dict:
+        hard_cuts = []
+        bounds = split_on_silence(self.audio, SAMPLE_RATE, target_seconds, max_seconds, hard_cuts=hard_cuts)
+        payloads = [{"model": self.model_size, "device": self.device, "download_root": self.download_root,
+                     "language": self.language, "task": self.task, "prompt": self.prompt, "fp16": self.fp16,
+                     "audio": self.audio[start:end]} for start, end in bounds]
+
+        progress = self.start_progress()
+        if len(payloads) == 1 or workers == 1:
+            results = []
+            for payload in payloads:
+                self.check_cancelled()
+                with span("inference", mode="chunked"):
+                    results.append(transcribe_chunk(payload))
+                progress.advance(len(payload["audio"]) / SAMPLE_RATE)
+        else:
+            results = [None] * len(payloads)
+            weights = [end - start for start, end in bounds]
+            with span("inference", mode="parallel", chunks=len(payloads)):
+                for index, result, error in run_parallel(transcribe_chunk, payloads, workers, threads, weights,
+                                                         self.cancel_token):
+                    if error is not None:
+                        raise error
+                    results[index] = result
+                    progress.advance(weights[index] / SAMPLE_RATE)
+
+        return self.finish_result(merge_chunk_results(results, bounds, hard_cuts=hard_cuts))
+
+    def transcribe_batched(self, batch_size: int = 8) -> dict:
+        from src.batching import batch_windows, decode_windows, parse_result
+
+        if self.prompt.get("word_timestamps"):
+            print("[!] Word timestamps are not supported in batched mode, transcribing sequentially.")
+            return self.transcribe()
+
+        hard_cuts = []
+        bounds = batch_windows(self.audio, hard_cuts=hard_cuts)
+        thresholds = {name: self.prompt[name] for name in ["no_speech_threshold", "logprob_threshold"]
+                      if name in self.prompt}
+
+        progress = self.start_progress()
+        results = []
+        for index in range(0, len(bounds), max(1, batch_size)):
+            self.check_cancelled()
+            batch = bounds[index:index + batch_size]
+            with span("inference", mode="batched", windows=len(batch)):
+                decoded = decode_windows(self.load_model, [self.audio[start:end] for start, end in batch],
+                                         self.language, self.task, self.fp16, self.prompt,
+                                         self.feature_keys(batch))
+            for (start, end), result in zip(batch, decoded):
+                results.append(parse_result(self.load_model, result, (end - start) / SAMPLE_RATE, self.task,
+                                            **thresholds))
+            progress.update(batch[-1][1] / SAMPLE_RATE)
+
+        progress.finish()
+        return self.finish_result(merge_chunk_results(results, bounds, hard_cuts=hard_cuts))
+
+    def feature_keys(self, bounds: list) -> list:
+        if not self.audio_key:
+            return None
+        return [{"audio": self.audio_key, "model": self.model_size, "device": self.device, "fp16": self.fp16,
+                 "window": [start, end]} for start, end in bounds]
+
+    def iter_segments(self):
+        from src.batching import batch_windows, decode_windows, parse_result
+
+        # Same windows as batched mode: never longer than one 30 second encoder pass.
+        hard_cuts = []
+        bounds = batch_windows(self.audio, hard_cuts=hard_cuts)
+        condition = self.prompt.get("condition_on_previous_text", True)
+        thresholds = {name: self.prompt[name] for name in ["no_speech_threshold", "logprob_threshold"]
+                      if name in self.prompt}
+
+        progress = self.start_progress()
+        results = []
+        for start, end in bounds:
+            self.check_cancelled()
+            prompt = dict(self.prompt)
+            # Carry the tail of the previous chunk over as the prompt so the
+            # chunks keep the context whisper would have had in one pass.
+            if results and condition:
+                prompt["initial_prompt"] = results[-1]["text"][-200:]
+
+            with span("inference", mode="stream", start=round(start / SAMPLE_RATE, 2)):
+                if self.prompt.get("word_timestamps"):
+                    # Word alignment needs whisper.transcribe's own pass over the window.
+                    result = self.load_model.transcribe(self.audio[start:end], language=self.language,
+                                                        task=self.task, fp16=self.fp16, **prompt)
+                else:
+                    # Decoding from the cached encoder output, changing task, language or
+                    # prompt only reruns the decoder.
+                    decoded = decode_windows(self.load_model, [self.audio[start:end]], self.language, self.task,
+                                             self.fp16, prompt, self.feature_keys([(start, end)]))[0]
+                    result = parse_result(self.load_model, decoded, (end - start) / SAMPLE_RATE, self.task,
+                                          **thresholds)
+            results.append(result)
+            progress.update(end / SAMPLE_RATE)
+
+            offset = start / SAMPLE_RATE
+            segments = [offset_segment(segment, offset, int(round(offset * 100))) for segment in result["segments"]]
+            yield remap_segments(segments, self.timeline) if self.timeline else segments
+
+        self.finish_result(merge_chunk_results(results, bounds, hard_cuts=hard_cuts))
+
+    def transcribe_stream(self, callback: any) -> dict:
+        for segments in self.iter_segments():
+            if segments:
+                callback(segments)
+        return self.result
+
+    def detect_language(self, windows: int = 1, window_seconds: float = 30.0) -> str:
+        import whisper
+
+        if self.model_size.endswith(".en"):
+            return "en"
+
+        # Reuse the model we are about to transcribe with when it is already
+        # resident, otherwise fall back to the shared tiny model.
+        if MODEL_CACHE.is_loaded(self.model_size, device=self.device, download_root=self.download_root):
+            model = MODEL_CACHE.get(self.model_size, device=self.device, download_root=self.download_root)
+        else:
+            model = MODEL_CACHE.get("tiny", device=self.device)
 
-        _, probs = model.detect_language(mel)
-        return f"{max(probs, key=probs.get)}"
+        votes = {}
+        for audio in self.detection_windows(windows, window_seconds):
+            self.check_cancelled()
+            audio = whisper.pad_or_trim(audio)
+            mel = whisper.log_mel_spectrogram(audio, n_mels=model.dims.n_mels).to(model.device)
+
+            _, probs = model.detect_language(mel)
+            for lang, prob in probs.items():
+                votes[lang] = votes.get(lang, 0.0) + prob
+
+        return f"{max(votes, key=votes.get)}"
+
+    def detection_windows(self, windows: int = 1, window_seconds: float = 30.0) -> list:
+        duration = self.media_info.get("duration") or 0.0
+        if self.audio is not None:
+            duration = len(self.audio) / SAMPLE_RATE
+
+        windows = max(1, windows)
+        spread = max(duration - window_seconds, 0.0)
+        offsets = [spread * i / (windows - 1) for i in range(windows)] if windows > 1 and spread else [0.0]
+
+        if self.audio is not None:
+            size = int(window_seconds * SAMPLE_RATE)
+            return [self.audio[int(offset * SAMPLE_RATE):int(offset * SAMPLE_RATE) + size] for offset in offsets]
+
+        return [decode_audio(self.audio_file, offset=offset, duration=window_seconds, cancel_token=self.cancel_token)
+                for offset in offsets]
 
     def subtitles_writer(self, output_dir: str = None, output_format: str = "txt", options: dict = None) -> None:
+        from whisper.utils import get_writer
+
         if not os.path.isdir(output_dir):
             raise NotADirectoryError(f"({output_dir}) is not a valid directory")
 
@@ -398,13 +905,7 @@ class WhisperTranscriber:
         if output_format not in extensions:
             raise ValueError(f"[!] ({output_format}) is not a valid output format!")
 
-        default_options = {
-            'max_line_width': None,
-            'max_line_count': None,
-            'highlight_words': False
-        }
-
-        options = options if options else default_options
+        options = options if options else dict(WRITER_OPTIONS)
 
         writer = get_writer(output_format, output_dir)
         writer(self.result, self.audio_file, options)
@@ -435,13 +936,20 @@ class WhisperTranscriber:
         return valid_prompts
 
     @staticmethod
-    def validate_file(file_path: str) -> bool:
-        if not os.path.isfile(file_path):
-            return False
-
+    def load_audio(file_path: str, cancel_token: any = None, use_cache: bool = True) -> np.ndarray:
         try:
-            AudioSegment.from_file(file_path)
-            return True
-        except Exception as e:
+            return load_pcm(file_path, cancel_token, use_cache)
+        except RuntimeError as e:
             print(e)
-            return False
+            raise ValueError("Error, file is not valid") from e
+
+    @staticmethod
+    def probe_file(file_path: str) -> dict:
+        if not os.path.isfile(file_path):
+            return {"conclusive": True, "valid": False}
+
+        return inspect_media(file_path)
+
+    @staticmethod
+    def validate_file(file_path: str) -> bool:
+        return WhisperTranscriber.probe_file(file_path)["valid"]
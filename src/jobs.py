@@ -0,0 +1,340 @@
+import gc
+import itertools
+import os
+import time
+from queue import Empty, PriorityQueue
+from threading import Event, Lock, Thread
+
+from src.memory import MEMORY_CALIBRATION, RssSampler, available_memory
+from src.tracing import TRACE_DIR, Trace, activate, dump_chrome_trace, span
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Left free for the OS and the GUI when admitting a job.
+MEMORY_RESERVE = 512 * 1024 ** 2
+ADMISSION_TIMEOUT = 30.0
+ADMISSION_RETRY = 1.0
+
+_job_ids = itertools.count(1)
+
+
+class JobCancelled(Exception):
+    def __init__(self, message: str = "Job cancelled"):
+        super().__init__(message)
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = Event()
+        self._lock = Lock()
+        self._processes = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            terminate_process(process)
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled()
+
+    def register(self, process: any) -> None:
+        with self._lock:
+            self._processes.append(process)
+        if self.cancelled:
+            terminate_process(process)
+
+    def unregister(self, process: any) -> None:
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+
+
+def terminate_process(process: any, timeout: float = 3.0) -> None:
+    try:
+        if process.poll() is not None:
+            return
+        process.terminate()
+        process.wait(timeout)
+    except Exception:
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+
+class Job:
+    def __init__(self, func: any, options: dict = None, callback: any = None, error_callback: any = None,
+                 priority: int = 0, name: str = None, memory: any = None):
+        self.id = next(_job_ids)
+        self.func = func
+        self.options = options
+        self.callback = callback
+        self.error_callback = error_callback
+        self.priority = priority
+        self.name = name or getattr(func, "__name__", "job")
+        self.memory = memory
+        self.memory_estimate = None
+        self.admission_deadline = None
+        self.peak_rss = None
+        self.memory_used = None
+
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.cancel_token = CancelToken()
+        self.trace = Trace(f"job {self.id} {self.name}")
+        self._done = Event()
+        self._state_lock = Lock()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self) -> bool:
+        with self._state_lock:
+            if self.done():
+                return False
+
+            # Queued jobs are finished right away, running ones stop at their next check.
+            queued = self.state == QUEUED
+            if queued:
+                self._finish(CANCELLED, error=JobCancelled())
+
+        self.cancel_token.cancel()
+        if queued and self.error_callback:
+            self.error_callback(self.error)
+        return True
+
+    def _start(self) -> bool:
+        # Atomic with cancel(), a job is either cancelled while queued or started, never both.
+        with self._state_lock:
+            if self.done():
+                return False
+            self.state = RUNNING
+            self.started_at = time.time()
+            return True
+
+    def _finish(self, state: str, error: Exception = None) -> None:
+        self.state = state
+        self.error = error
+        self.finished_at = time.time()
+        self.trace.finish()
+        self._done.set()
+
+    def wait(self, timeout: float = None) -> any:
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Job {self.id} ({self.name}) did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": str(self.error) if self.error else None,
+            "memory_estimate": self.memory_estimate["bytes"] if self.memory_estimate else None,
+            "peak_rss": self.peak_rss,
+            "memory_used": self.memory_used,
+            "trace": self.trace.summary(),
+        }
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id} {self.name} {self.state}>"
+
+
+class JobScheduler:
+    def __init__(self, max_workers: int = 1, history: int = 100):
+        self.max_workers = max_workers
+        self.history = history
+
+        self._queue = PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs = []
+        self._workers = []
+        self._deferred = []
+        self._lock = Lock()
+
+    def submit(self, func: any, options: dict = None, callback: any = None, error_callback: any = None,
+               priority: int = 0, name: str = None, memory: any = None) -> Job:
+        job = Job(func, options, callback, error_callback, priority, name, memory)
+
+        with self._lock:
+            self._jobs.append(job)
+            self._trim_history()
+            self._ensure_workers()
+
+        # Higher priority first, FIFO among equal priorities.
+        self._queue.put((-priority, next(self._sequence), job))
+        return job
+
+    def jobs(self, state: str = None) -> list:
+        with self._lock:
+            return [job for job in self._jobs if state is None or job.state == state]
+
+    def pending(self) -> int:
+        return len(self.jobs(QUEUED)) + len(self.jobs(RUNNING))
+
+    def cancel_all(self) -> None:
+        for job in self.jobs():
+            job.cancel()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+
+        for _ in workers:
+            self._queue.put((float("inf"), next(self._sequence), None))
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _ensure_workers(self) -> None:
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = Thread(target=self._worker_loop, daemon=True, name=f"job-worker-{len(self._workers) + 1}")
+            self._workers.append(worker)
+            worker.start()
+
+    def _trim_history(self) -> None:
+        finished = [job for job in self._jobs if job.done()]
+        for job in finished[:max(len(self._jobs) - self.history, 0)]:
+            self._jobs.remove(job)
+
+    def _worker_loop(self) -> None:
+        while True:
+            self._requeue_deferred()
+            try:
+                priority, sequence, job = self._queue.get(timeout=self._retry_delay())
+            except Empty:
+                continue
+            if job is None:
+                return
+            if job.done():
+                continue
+            if not self._ready(job):
+                # Parked until memory frees up, the worker moves on to the next job meanwhile.
+                with self._lock:
+                    self._deferred.append((time.monotonic() + ADMISSION_RETRY, (priority, sequence, job)))
+                continue
+            # The estimate may take a while (ffprobe), the job can be cancelled meanwhile.
+            if not job._start():
+                continue
+            self._run(job)
+
+    def _requeue_deferred(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            due = [entry for retry_at, entry in self._deferred if retry_at <= now]
+            self._deferred = [(retry_at, entry) for retry_at, entry in self._deferred if retry_at > now]
+        for entry in due:
+            self._queue.put(entry)
+
+    def _retry_delay(self) -> float:
+        with self._lock:
+            if not self._deferred:
+                return None
+            return max(min(retry_at for retry_at, _ in self._deferred) - time.monotonic(), 0.0)
+
+    @staticmethod
+    def _ready(job: Job) -> bool:
+        # False while the job waits for memory; past the deadline it is let
+        # through and _admit fails it.
+        if job.memory is None:
+            return True
+
+        first = job.memory_estimate is None
+        with activate(job.trace), span("admission"):
+            if first:
+                job.memory_estimate = job.memory(dict(job.options or {}, cancel_token=job.cancel_token))
+                job.admission_deadline = time.monotonic() + ADMISSION_TIMEOUT
+            needed = job.memory_estimate["bytes"]
+            available = available_memory()
+            if available is None or needed <= available - MEMORY_RESERVE \
+                    or time.monotonic() >= job.admission_deadline:
+                return True
+
+        if first:
+            print(f"[!] Waiting for memory: job {job.id} needs about {needed / 1024 ** 3:.1f} GB, "
+                  f"{available / 1024 ** 3:.1f} GB available.")
+            gc.collect()
+        return False
+
+    @staticmethod
+    def _admit(job: Job) -> None:
+        if job.memory_estimate is None:
+            return
+
+        needed = job.memory_estimate["bytes"]
+        available = available_memory()
+        if available is not None and needed > available - MEMORY_RESERVE:
+            raise MemoryError(f"Not enough memory for this job: it needs about {needed / 1024 ** 3:.1f} GB "
+                              f"and {available / 1024 ** 3:.1f} GB is available. Close other applications "
+                              f"or choose a smaller model.")
+
+    @staticmethod
+    def _run(job: Job) -> None:
+        def deliver(value: any) -> None:
+            job.cancel_token.check()
+            job.result = value
+            if job.callback:
+                job.callback(value)
+
+        job.trace.add("queued", job.trace.started, time.perf_counter())
+        options = dict(job.options or {}, cancel_token=job.cancel_token)
+        sampler = RssSampler(interval=0.1)
+        try:
+            with activate(job.trace):
+                JobScheduler._admit(job)
+                with sampler:
+                    job.func(options, deliver)
+            job._finish(DONE)
+        except JobCancelled as e:
+            # The traceback pins the task's frames, and with them its audio buffers.
+            job._finish(CANCELLED, error=e.with_traceback(None))
+            if job.error_callback:
+                job.error_callback(e)
+        except Exception as e:
+            print(f"Error: {e}")
+            job._finish(FAILED, error=e)
+            if job.error_callback:
+                job.error_callback(e)
+        finally:
+            # Drop the references a cancelled or failed task may still hold (audio buffers, results).
+            del options
+            gc.collect()
+
+            if sampler.peak:
+                job.peak_rss = sampler.peak
+                job.memory_used = sampler.peak - sampler.start_rss
+                if job.state == DONE and job.memory_estimate:
+                    MEMORY_CALIBRATION.update(job.memory_estimate["key"], job.memory_estimate["raw"],
+                                              job.memory_used)
+
+            print(f"[{job.state}] {job.trace.summary()}")
+            if TRACE_DIR:
+                os.makedirs(TRACE_DIR, exist_ok=True)
+                dump_chrome_trace([job.trace], os.path.join(TRACE_DIR, f"job-{job.id}-{job.name}.json"))
+
+
+JOB_SCHEDULER = JobScheduler(max_workers=1)
@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+import threading
+
+from src.cache import CACHE_DIR
+
+CALIBRATION_FILE = CACHE_DIR / "memory_calibration.json"
+
+
+def current_rss() -> int:
+    if sys.platform.startswith("win"):
+        return _windows_counters().WorkingSetSize
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    if sys.platform.startswith("win"):
+        return _windows_counters().PeakWorkingSetSize
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_kernel_peak() -> bool:
+    # Linux can reset the VmHWM high-water mark, which catches spikes that
+    # fall between two samples.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _kernel_peak() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def available_memory() -> int:
+    if sys.platform.startswith("win"):
+        import ctypes
+
+        class MemoryStatusEx(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatusEx()
+        status.dwLength = ctypes.sizeof(status)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+        return status.ullAvailPhys
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Unknown (e.g. macOS), callers treat this as "do not limit".
+    return None
+
+
+def _windows_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                             counters.cb)
+    return counters
+
+
+class RssSampler:
+    # The OS only tracks the lifetime peak, so the peak of one stage is
+    # sampled from a background thread while that stage runs.
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak = 0
+        self._kernel_peak = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "RssSampler":
+        self._kernel_peak = _reset_kernel_peak()
+        self.start_rss = self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="rss-sampler")
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.peak = max(self.peak, current_rss(), _kernel_peak() if self._kernel_peak else 0)
+        return self.peak
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self) -> "RssSampler":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+class MemoryCalibration:
+    # Learned ratio of measured to estimated memory per model and device,
+    # so estimates converge on what this machine actually uses.
+    def __init__(self, path: str = CALIBRATION_FILE, weight: float = 0.3, limits: tuple = (0.5, 3.0)):
+        self.path = path
+        self.weight = weight
+        self.limits = limits
+        self._factors = None
+        self._lock = threading.Lock()
+
+    def factor(self, key: str) -> float:
+        with self._lock:
+            return self._load().get(key, 1.0)
+
+    def update(self, key: str, estimated: int, actual: int) -> float:
+        if estimated <= 0 or actual <= 0:
+            return self.factor(key)
+
+        with self._lock:
+            factors = self._load()
+            observed = min(max(actual / estimated, self.limits[0]), self.limits[1])
+            factors[key] = round((1 - self.weight) * factors.get(key, 1.0) + self.weight * observed, 4)
+            self._save(factors)
+            return factors[key]
+
+    def _load(self) -> dict:
+        if self._factors is None:
+            try:
+                with open(self.path) as f:
+                    self._factors = json.load(f)
+            except (OSError, ValueError):
+                self._factors = {}
+        return self._factors
+
+    def _save(self, factors: dict) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(factors, f, indent=4)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error: {e}")
+
+
+MEMORY_CALIBRATION = MemoryCalibration()
@@ -0,0 +1,168 @@
+import time
+from collections import OrderedDict
+from threading import RLock, Timer
+
+DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+INT8_DEVICE = "cpu (int8)"
+
+
+def model_size_bytes(model: any) -> int:
+    params = sum(p.numel() * p.element_size() for p in model.parameters())
+    buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+
+    # Dynamically quantized linears keep their int8 weights in packed params, not in parameters().
+    packed = sum(module.weight().numel() for module in model.modules()
+                 if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)))
+
+    return params + buffers + packed
+
+
+def load_whisper_model(model_size: str, device: str = None, download_root: str = None) -> any:
+    import whisper
+
+    if device == INT8_DEVICE:
+        from src.quantization import quantize_model
+        return quantize_model(whisper.load_model(model_size, device="cpu", download_root=download_root))
+
+    return whisper.load_model(model_size, device=device, download_root=download_root)
+
+
+class ModelCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+
+        self._models = OrderedDict()
+        self._lock = RLock()
+        self._timer = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_size: str, device: str = None, download_root: str = None) -> any:
+        key = (model_size, device, download_root)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry["last_used"] = time.monotonic()
+                self._models.move_to_end(key)
+                return entry["model"]
+
+            self.misses += 1
+            model = load_whisper_model(model_size, device=device, download_root=download_root)
+            self.put(key, model)
+            return model
+
+    def acquire(self, model_size: str, device: str = None, download_root: str = None) -> any:
+        # Pinned models are never evicted; their idle clock starts on release.
+        with self._lock:
+            model = self.get(model_size, device, download_root)
+            self._models[(model_size, device, download_root)]["refs"] += 1
+            return model
+
+    def release(self, model_size: str, device: str = None, download_root: str = None) -> None:
+        with self._lock:
+            entry = self._models.get((model_size, device, download_root))
+            if entry is None:
+                return
+            entry["refs"] = max(entry["refs"] - 1, 0)
+            entry["last_used"] = time.monotonic()
+            self._evict_over_budget()
+            self._schedule_sweep()
+
+    def put(self, key: tuple, model: any) -> None:
+        with self._lock:
+            self._models[key] = {"model": model, "size": model_size_bytes(model), "last_used": time.monotonic(),
+                                 "refs": 0}
+            self._models.move_to_end(key)
+            self._evict_over_budget(keep=key)
+            self._schedule_sweep()
+
+    def is_loaded(self, model_size: str, device: str = None, download_root: str = None) -> bool:
+        with self._lock:
+            return (model_size, device, download_root) in self._models
+
+    def unload(self, model_size: str, device: str = None, download_root: str = None) -> bool:
+        with self._lock:
+            return self._drop((model_size, device, download_root))
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._models):
+                self._drop(key)
+
+    def set_budget(self, max_bytes: int = None, idle_timeout: float = None) -> None:
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+            self._evict_over_budget()
+            self._schedule_sweep()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loaded": [key[0] for key in self._models],
+                "resident_bytes": self._resident_bytes(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def sweep_idle(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            for key, entry in list(self._models.items()):
+                if not entry["refs"] and now - entry["last_used"] >= self.idle_timeout:
+                    self._drop(key, evicted=True)
+            self._timer = None
+            self._schedule_sweep()
+
+    def _resident_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._models.values())
+
+    def _evict_over_budget(self, keep: tuple = None) -> None:
+        # Least recently used models sit at the front of the OrderedDict.
+        for key in list(self._models):
+            if self._resident_bytes() <= self.max_bytes:
+                break
+            if key != keep and not self._models[key]["refs"]:
+                self._drop(key, evicted=True)
+
+    def _drop(self, key: tuple, evicted: bool = False) -> bool:
+        entry = self._models.pop(key, None)
+        if entry is None:
+            return False
+
+        # Explicit unload/clear calls are not evictions.
+        if evicted:
+            self.evictions += 1
+        device = getattr(entry["model"], "device", None)
+        del entry
+
+        if getattr(device, "type", None) == "cuda":
+            import torch
+            torch.cuda.empty_cache()
+
+        return True
+
+    def _schedule_sweep(self) -> None:
+        idle = [entry["last_used"] for entry in self._models.values() if not entry["refs"]]
+        if self._timer is not None or not idle or not self.idle_timeout:
+            return
+
+        oldest = min(idle)
+        delay = max(oldest + self.idle_timeout - time.monotonic(), 1.0)
+
+        self._timer = Timer(delay, self.sweep_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+MODEL_CACHE = ModelCache()
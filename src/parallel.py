@@ -0,0 +1,132 @@
+import atexit
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+_pool = None
+_pool_layout = None
+_pool_lock = threading.Lock()
+
+
+def worker_layout(workers: int = None, threads: int = None) -> tuple:
+    cores = os.cpu_count() or 1
+
+    # Whisper's matmuls stop scaling well past a handful of threads, so by
+    # default we prefer more processes with about four threads each.
+    if workers is None and threads is None:
+        threads = min(4, cores)
+    if workers is None:
+        workers = max(1, cores // threads)
+    if threads is None:
+        threads = max(1, cores // workers)
+
+    return max(1, workers), max(1, threads)
+
+
+def _init_worker(threads: int) -> None:
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def _run_in_worker(func: any, payload: any) -> any:
+    # Each worker process keeps its own MODEL_CACHE, so the model stays
+    # warm across every task dispatched to that worker.
+    return func(payload)
+
+
+def get_pool(workers: int, threads: int) -> ProcessPoolExecutor:
+    global _pool, _pool_layout
+
+    # One pool outlives each call, so the warm models in its workers are
+    # reused by the next file instead of being loaded again.
+    with _pool_lock:
+        if _pool is not None and getattr(_pool, "_broken", False):
+            _pool = None
+        if _pool is not None and _pool_layout != (workers, threads):
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                        initializer=_init_worker, initargs=(threads,))
+            _pool_layout = (workers, threads)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool, _pool_layout
+
+    with _pool_lock:
+        pool, _pool, _pool_layout = _pool, None, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool, _pool_layout
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_layout = None, None
+    _kill_pool(pool)
+
+
+def run_parallel(func: any, payloads: list, workers: int = None, threads: int = None, weights: list = None,
+                 cancel_token: any = None):
+    workers, threads = worker_layout(workers, threads)
+
+    # Dispatch the heaviest items first so a long file does not end up
+    # running alone on one worker at the tail of the batch.
+    order = list(range(len(payloads)))
+    if weights:
+        order.sort(key=lambda index: weights[index], reverse=True)
+
+    pool = get_pool(workers, threads)
+    try:
+        futures = {pool.submit(_run_in_worker, func, payloads[index]): index for index in order}
+        pending = set(futures)
+
+        while pending:
+            if cancel_token is not None:
+                cancel_token.check()
+
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    yield index, future.result(), None
+                except Exception as e:
+                    yield index, None, e
+    except BaseException:
+        # The workers may still be busy with cancelled work, the next call starts a fresh pool.
+        _discard_pool(pool)
+        raise
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    # Workers may be in the middle of a long forward pass, waiting for them
+    # would defeat cancelling, so terminate them outright.
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def transcribe_files(options_list: list, workers: int = None, threads: int = None, cancel_token: any = None):
+    from src.functions import run_transcription
+
+    weights = [os.path.getsize(options["audio"]) if os.path.isfile(options["audio"]) else 0
+               for options in options_list]
+
+    yield from run_parallel(run_transcription, options_list, workers, threads, weights, cancel_token)
+
+
+atexit.register(shutdown_pool)
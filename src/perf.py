@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.audio import SAMPLE_RATE
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "perf_baseline.json")
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.10
+# Differences below this are timer and scheduler noise, not regressions.
+MIN_DELTA_SECONDS = 0.005
+STUB_MODEL = "base"
+
+
+class StubModel:
+    # Deterministic stand-in for a whisper model: one segment every five
+    # seconds of input, so the pipeline around inference is what gets timed.
+    class Dims:
+        n_mels = 80
+
+    dims = Dims()
+    device = "cpu"
+    is_multilingual = True
+
+    def transcribe(self, audio: np.ndarray, **kwargs) -> dict:
+        duration = len(audio) / SAMPLE_RATE
+        segments = []
+        for index, start in enumerate(np.arange(0.0, duration, 5.0)):
+            end = min(start + 5.0, duration)
+            text = f" Segment {index} says the quick brown fox jumps over the lazy dog."
+            segments.append({"id": index, "seek": int(start * 100), "start": float(start), "end": float(end),
+                             "text": text, "tokens": [], "temperature": 0.0, "avg_logprob": -0.2,
+                             "compression_ratio": 1.2, "no_speech_prob": 0.01})
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": "en"}
+
+    def detect_language(self, mel: any) -> tuple:
+        return None, {"en": 0.9, "de": 0.06, "fr": 0.04}
+
+    def parameters(self) -> list:
+        return []
+
+    def buffers(self) -> list:
+        return []
+
+    def modules(self) -> list:
+        return []
+
+
+def calibrate(repeat: int = 15) -> float:
+    # A fixed mix of numpy and interpreter work. Stage times are scaled by
+    # how long this takes, so a slower or busier machine does not read as a
+    # regression.
+    data = np.random.default_rng(0).standard_normal((1024, 512)).astype(np.float32)
+
+    def run():
+        np.abs(np.fft.rfft(data, axis=1)).sum()
+        sorted(str(index) for index in range(50000))
+
+    return min(measure(run, repeat, trace=False)["seconds"], 1.0) or 1e-6
+
+
+def measure(func: any, repeat: int = 5, trace: bool = True) -> dict:
+    # Best of several runs for time, one traced run for allocations.
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    if not trace:
+        return {"seconds": round(min(timings), 5)}
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": round(min(timings), 5), "peak_kb": round(peak / 1024, 1)}
+
+
+def make_fixture(directory: str, seconds: float = 120.0) -> dict:
+    from src.benchmark import synthetic_clip, write_wav
+
+    audio = synthetic_clip(seconds, seed=7)
+    path = write_wav(os.path.join(directory, "fixture.wav"), audio)
+    return {"path": path, "audio": audio, "directory": directory}
+
+
+def install_stub() -> None:
+    from src.model_cache import MODEL_CACHE
+
+    stub = StubModel()
+    for model in [STUB_MODEL, f"{STUB_MODEL}.en", "tiny"]:
+        MODEL_CACHE.put((model, "cpu", None), stub)
+
+
+def stage_fingerprint(fixture: dict) -> any:
+    from src.fingerprint import clear_memo, file_fingerprint
+
+    def run():
+        clear_memo()
+        file_fingerprint(fixture["path"])
+    return run
+
+
+def stage_ingest(fixture: dict) -> any:
+    from src.audio import decode_audio
+    return lambda: decode_audio(fixture["path"])
+
+
+def stage_vad(fixture: dict) -> any:
+    from src.vad import collapse_non_speech, detect_speech
+
+    def run():
+        collapse_non_speech(fixture["audio"], detect_speech(fixture["audio"]))
+    return run
+
+
+def stage_split(fixture: dict) -> any:
+    from src.chunking import split_on_silence
+    return lambda: split_on_silence(fixture["audio"], SAMPLE_RATE, 30.0, 45.0)
+
+
+def stage_detection(fixture: dict) -> any:
+    # A fixed non-English language keeps the multilingual model, English would
+    # switch to the .en model, which skips detection altogether.
+    transcriber = _transcriber(fixture, language="fr")
+    transcriber.release_model()
+    return lambda: transcriber.detect_language(windows=3)
+
+
+def stage_transcription(fixture: dict) -> any:
+    return lambda: _run_transcriber(fixture, lambda transcriber: transcriber.transcribe())
+
+
+def stage_writers(fixture: dict) -> any:
+    from src.functions import OUTPUT_FORMATS, subtitles_writer
+
+    result = StubModel().transcribe(fixture["audio"])
+    formats = [output_format for output_format in OUTPUT_FORMATS if output_format != "all"]
+
+    def run():
+        for output_format in formats:
+            subtitles_writer({"output_dir": os.path.join(fixture["directory"], f"fixture.{output_format}"),
+                              "result": result, "audio_file": fixture["path"]}, lambda message: None)
+    return run
+
+
+def stage_dropdown_filter(fixture: dict) -> any:
+    from src.functions import LANGUAGE_VALUES, filter_values
+
+    queries = ["e", "en", "eng", "sp", "port", "chinse", "x", "norw", "haitian creole"]
+
+    def run():
+        for query in queries:
+            filter_values(LANGUAGE_VALUES, query)
+    return run
+
+
+def _transcriber(fixture: dict, language: str = "en") -> any:
+    from src.functions import WhisperTranscriber
+    return WhisperTranscriber(audio_file=fixture["path"], model_size=STUB_MODEL, device="cpu", language=language,
+                              audio=fixture["audio"])
+
+
+def _run_transcriber(fixture: dict, run: any) -> dict:
+    transcriber = _transcriber(fixture)
+    try:
+        return run(transcriber)
+    finally:
+        transcriber.release_model()
+
+
+STAGES = {
+    "fingerprint": (stage_fingerprint, []),
+    "ingest": (stage_ingest, ["ffmpeg"]),
+    "vad": (stage_vad, []),
+    "split": (stage_split, []),
+    "detection": (stage_detection, ["ffprobe", "whisper"]),
+    "transcription": (stage_transcription, ["ffprobe", "whisper"]),
+    "writers": (stage_writers, ["whisper"]),
+    "dropdown_filter": (stage_dropdown_filter, []),
+}
+
+
+def missing_requirements(requirements: list) -> list:
+    missing = []
+    for requirement in requirements:
+        if requirement in ["ffmpeg", "ffprobe"]:
+            if shutil.which(requirement) is None:
+                missing.append(requirement)
+        else:
+            try:
+                __import__(requirement)
+            except ImportError:
+                missing.append(requirement)
+    return missing
+
+
+def run_stages(names: list = None, repeat: int = 5) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        fixture = make_fixture(directory)
+        install_stub()
+
+        for name, (stage, requirements) in STAGES.items():
+            if names and name not in names:
+                continue
+
+            missing = missing_requirements(requirements)
+            if missing:
+                results[name] = {"skipped": f"missing {', '.join(missing)}"}
+                continue
+
+            results[name] = measure(stage(fixture), repeat)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE,
+            memory_tolerance: float = DEFAULT_MEMORY_TOLERANCE, calibration: float = None) -> list:
+    # Baseline times are scaled to this machine's speed when both runs were calibrated.
+    scale = calibration / baseline["calibration"] if calibration and baseline.get("calibration") else 1.0
+
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get("stages", {}).get(name)
+        if "skipped" in result:
+            continue
+        if not expected:
+            # A stage without a baseline could never fail, so it counts against the run.
+            regressions.append(f"{name}: no baseline, record one with --update-baseline")
+            continue
+
+        seconds = expected["seconds"] * scale
+        if result["seconds"] > seconds * (1 + tolerance) and result["seconds"] - seconds > MIN_DELTA_SECONDS:
+            regressions.append(f"{name}: {result['seconds']:.4f}s vs baseline {seconds:.4f}s")
+        if result["peak_kb"] > expected["peak_kb"] * (1 + memory_tolerance):
+            regressions.append(f"{name}: peak {result['peak_kb']:.0f}KB vs baseline {expected['peak_kb']:.0f}KB")
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_FILE) -> dict:
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, path: str = BASELINE_FILE, calibration: float = None) -> None:
+    # Stages that could not run keep their previous baseline.
+    baseline = load_baseline(path)
+    stages = baseline.get("stages", {})
+    if calibration and baseline.get("calibration"):
+        # Kept stages are rescaled so every entry is relative to the new calibration.
+        scale = calibration / baseline["calibration"]
+        stages = {name: dict(stage, seconds=round(stage["seconds"] * scale, 5)) for name, stage in stages.items()}
+    stages.update({name: result for name, result in results.items() if "skipped" not in result})
+
+    with open(path, "w") as f:
+        json.dump({"machine": f"{platform.platform()} / {platform.python_version()}",
+                   "calibration": calibration or baseline.get("calibration"), "stages": stages}, f, indent=4)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.perf",
+                                     description="Time each pipeline stage and compare against the stored baseline.")
+    parser.add_argument("stages", nargs="*", help=f"stages to run: {', '.join(STAGES)} (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="runs per stage, best one counts (default: 5)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before failing (default: 0.25)")
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help="allowed growth in peak allocations (default: 0.10)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    calibration = calibrate()
+    results = run_stages(args.stages, args.repeat)
+    baseline = load_baseline(args.baseline)
+    if baseline.get("calibration"):
+        print(f"{'calibration':<16} {calibration:.4f}s  baseline {baseline['calibration']:.4f}s")
+
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<16} skipped ({result['skipped']})")
+            continue
+        expected = baseline.get("stages", {}).get(name)
+        reference = f"  baseline {expected['seconds']:.4f}s / {expected['peak_kb']:.0f}KB" if expected else ""
+        print(f"{name:<16} {result['seconds']:.4f}s / {result['peak_kb']:.0f}KB{reference}")
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline, calibration)
+        print(f"Baseline written to: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance, calibration)
+    for regression in regressions:
+        print(f"[!] Regression: {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
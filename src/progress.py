@@ -0,0 +1,99 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def format_duration(seconds: float) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def format_progress(progress: dict) -> str:
+    text = f"{format_duration(progress['processed'])} / {format_duration(progress['total'])} " \
+           f"({progress['percent']:.0f}%)"
+    if progress["rtf"] is not None:
+        text += f", RTF {progress['rtf']:.2f}, ETA {format_duration(progress['eta'])}"
+    return text
+
+
+class ProgressTracker:
+    def __init__(self, total_seconds: float, callback: any = None):
+        self.total = max(float(total_seconds or 0.0), 0.0)
+        self.callback = callback
+        self.processed = 0.0
+        self.started_at = time.monotonic()
+        self.updated_at = self.started_at
+
+    def update(self, processed_seconds: float) -> dict:
+        self.processed = min(max(processed_seconds, self.processed), self.total or processed_seconds)
+        self.updated_at = time.monotonic()
+
+        progress = self.snapshot()
+        if self.callback:
+            self.callback(progress)
+        return progress
+
+    def advance(self, seconds: float) -> dict:
+        return self.update(self.processed + seconds)
+
+    def finish(self) -> dict:
+        return self.update(self.total)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        elapsed = now - self.started_at
+
+        # Real-time factor: seconds of compute per second of audio, below 1.0 is faster than real time.
+        rtf = elapsed / self.processed if self.processed > 0 else None
+        eta = (self.total - self.processed) * rtf if rtf is not None else None
+
+        return {
+            "processed": self.processed,
+            "total": self.total,
+            "percent": 100.0 * self.processed / self.total if self.total else 0.0,
+            "elapsed": elapsed,
+            "rtf": rtf,
+            "eta": eta,
+            "since_update": now - self.updated_at,
+        }
+
+
+@contextmanager
+def window_progress(callback: any):
+    # whisper.transcribe advances a tqdm bar by mel frames after every window
+    # it decodes; while active, those updates are forwarded to callback.
+    _install_window_hook()
+    previous = getattr(_local, "callback", None)
+    _local.callback = callback
+    try:
+        yield
+    finally:
+        _local.callback = previous
+
+
+def _install_window_hook() -> None:
+    import importlib
+    import types
+
+    import tqdm
+
+    module = importlib.import_module("whisper.transcribe")
+    if getattr(module.tqdm, "window_hook", False):
+        return
+
+    class WindowProgressBar(tqdm.tqdm):
+        def update(self, n: float = 1) -> any:
+            updated = super().update(n)
+            callback = getattr(_local, "callback", None)
+            if callback:
+                callback(n)
+            return updated
+
+    # Only whisper.transcribe's reference is swapped, tqdm itself stays untouched.
+    module.tqdm = types.SimpleNamespace(tqdm=WindowProgressBar, window_hook=True)
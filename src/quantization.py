@@ -0,0 +1,90 @@
+import argparse
+import difflib
+import json
+import re
+import sys
+import time
+
+import torch
+
+
+def quantize_model(model: any) -> any:
+    # Whisper subclasses nn.Linear only to cast weights to the input dtype,
+    # which is a no-op in fp32. quantize_dynamic matches exact module types,
+    # so the subclass is swapped back to plain nn.Linear first.
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+
+    model = model.float().eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref = re.findall(r"\w+", reference.lower())
+    hyp = re.findall(r"\w+", hypothesis.lower())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    matcher = difflib.SequenceMatcher(None, ref, hyp, autojunk=False)
+    errors = sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal")
+    return errors / len(ref)
+
+
+def compare_precisions(files: list, model_size: str = "base", language: str = None, task: str = "transcribe") -> list:
+    from src.audio import load_pcm, SAMPLE_RATE
+    from src.model_cache import INT8_DEVICE, MODEL_CACHE
+
+    fp32 = MODEL_CACHE.get(model_size, device="cpu")
+    int8 = MODEL_CACHE.get(model_size, device=INT8_DEVICE)
+
+    rows = []
+    for file_path in files:
+        audio = load_pcm(file_path)
+        duration = len(audio) / SAMPLE_RATE
+
+        timings = {}
+        texts = {}
+        for name, model in (("fp32", fp32), ("int8", int8)):
+            started = time.perf_counter()
+            result = model.transcribe(audio, language=language, task=task, fp16=False)
+            timings[name] = time.perf_counter() - started
+            texts[name] = result["text"]
+
+        rows.append({
+            "file": file_path,
+            "duration": round(duration, 2),
+            "fp32_seconds": round(timings["fp32"], 2),
+            "int8_seconds": round(timings["int8"], 2),
+            "speedup": round(timings["fp32"] / timings["int8"], 2) if timings["int8"] else None,
+            "fp32_rtf": round(timings["fp32"] / duration, 3) if duration else None,
+            "int8_rtf": round(timings["int8"] / duration, 3) if duration else None,
+            "wer_vs_fp32": round(word_error_rate(texts["fp32"], texts["int8"]), 4),
+        })
+
+    return rows
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.quantization",
+                                     description="Compare fp32 and int8 CPU inference on the same clips.")
+    parser.add_argument("files", nargs="+", help="audio/video clips")
+    parser.add_argument("-m", "--model", default="base", help="model size (default: base)")
+    parser.add_argument("-l", "--language", default=None, help="spoken language (default: detect)")
+    parser.add_argument("-o", "--output", default=None, help="write the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    rows = compare_precisions(args.files, args.model, args.language)
+    for row in rows:
+        print(f"{row['file']}: fp32 {row['fp32_seconds']}s, int8 {row['int8_seconds']}s "
+              f"(x{row['speedup']}), WER vs fp32 {row['wer_vs_fp32']:.2%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_DIR = os.environ.get("WHISPER_GUI_TRACE_DIR")
+
+_local = threading.local()
+
+
+class Trace:
+    def __init__(self, name: str, started: float = None):
+        self.name = name
+        self.started = time.perf_counter() if started is None else started
+        self.finished = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), **args)
+
+    def add(self, name: str, start: float, end: float, **args) -> None:
+        with self._lock:
+            self.spans.append({"name": name, "start": start, "end": end, "thread": threading.get_ident(),
+                               "args": args})
+
+    def finish(self) -> None:
+        self.finished = time.perf_counter()
+
+    def duration(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def totals(self) -> dict:
+        totals = {}
+        with self._lock:
+            for record in self.spans:
+                totals[record["name"]] = totals.get(record["name"], 0.0) + record["end"] - record["start"]
+        return totals
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.totals().items())
+        return f"{self.name}: {self.duration():.2f}s" + (f" ({stages})" if stages else "")
+
+    def chrome_events(self, pid: int = 1) -> list:
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.name}}]
+        with self._lock:
+            for record in self.spans:
+                events.append({
+                    "name": record["name"],
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": record["thread"],
+                    "ts": round((record["start"] - self.started) * 1e6, 1),
+                    "dur": round((record["end"] - record["start"]) * 1e6, 1),
+                    "args": record["args"],
+                })
+        return events
+
+
+def dump_chrome_trace(traces: list, path: str) -> str:
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.extend(trace.chrome_events(pid))
+
+    # Loads in chrome://tracing and https://ui.perfetto.dev
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+@contextmanager
+def activate(trace: Trace):
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def current_trace() -> Trace:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name: str, **args):
+    # A no-op outside of a traced job, so library code can be instrumented unconditionally.
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        yield
+        return
+
+    with trace.span(name, **args):
+        yield
@@ -0,0 +1,140 @@
+from bisect import bisect_right
+
+import numpy as np
+
+from src.audio import SAMPLE_RATE
+from src.chunking import FRAME_SECONDS, frame_energy_db, silence_threshold
+
+
+def zero_crossing_rate(audio: np.ndarray, sr: int = SAMPLE_RATE, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    frame = max(1, int(sr * frame_seconds))
+    count = len(audio) // frame
+    frames = np.asarray(audio[:count * frame]).reshape(count, frame)
+    return np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+
+
+def spectral_flatness(audio: np.ndarray, indices: np.ndarray, sr: int = SAMPLE_RATE,
+                      frame_seconds: float = FRAME_SECONDS, block: int = 512) -> np.ndarray:
+    # Only the given frames are analysed, in blocks, so the spectra never
+    # need more than a few megabytes.
+    frame = max(1, int(sr * frame_seconds))
+    window = np.hanning(frame).astype(np.float32)
+    flatness = np.empty(len(indices), dtype=np.float32)
+    for position in range(0, len(indices), block):
+        starts = indices[position:position + block] * frame
+        frames = np.asarray(audio, dtype=np.float32)[starts[:, None] + np.arange(frame)]
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-10
+        flatness[position:position + block] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return flatness
+
+
+def energy_modulation(energy: np.ndarray, floor: float, window_frames: int) -> np.ndarray:
+    # Standard deviation of the frame energy around each frame. Syllables make
+    # speech rise and fall several times a second, sustained music stays level.
+    energy = np.maximum(energy, floor).astype(np.float64)
+    half = max(1, window_frames // 2)
+    sums = np.concatenate(([0.0], np.cumsum(energy)))
+    squares = np.concatenate(([0.0], np.cumsum(energy ** 2)))
+
+    index = np.arange(len(energy))
+    lo, hi = np.maximum(index - half, 0), np.minimum(index + half + 1, len(energy))
+    mean = (sums[hi] - sums[lo]) / (hi - lo)
+    return np.sqrt(np.maximum((squares[hi] - squares[lo]) / (hi - lo) - mean ** 2, 0.0))
+
+
+def detect_speech(audio: np.ndarray, sr: int = SAMPLE_RATE, threshold_db: float = None, min_speech: float = 0.25,
+                  min_gap: float = 0.6, pad: float = 0.2, frame_seconds: float = FRAME_SECONDS,
+                  modulation_db: float = 4.0, modulation_seconds: float = 1.5) -> list:
+    energy = frame_energy_db(audio, sr, frame_seconds)
+    if energy.size == 0:
+        return []
+
+    threshold = silence_threshold(energy, margin_db=15.0) if threshold_db is None else threshold_db
+    zcr = zero_crossing_rate(audio, sr, frame_seconds)
+    modulation = energy_modulation(energy, threshold, int(modulation_seconds / frame_seconds))
+
+    # Loud frames count as speech unless they look like broadband hiss (high
+    # zero-crossing rate or a flat spectrum) or like music (level energy).
+    voiced = (energy > threshold) & (zcr < 0.35) & (modulation > modulation_db)
+    candidates = np.flatnonzero(voiced)
+    voiced[candidates] = spectral_flatness(audio, candidates, sr, frame_seconds) < 0.5
+
+    flags = np.concatenate(([0], voiced.astype(np.int8), [0]))
+    edges = np.diff(flags)
+    starts = np.flatnonzero(edges == 1) * frame_seconds
+    ends = np.flatnonzero(edges == -1) * frame_seconds
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    total = len(audio) / sr
+    padded = []
+    for start, end in regions:
+        if end - start < min_speech:
+            continue
+        start, end = max(start - pad, 0.0), min(end + pad, total)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+
+    return [(int(start * sr), int(end * sr)) for start, end in padded]
+
+
+def collapse_non_speech(audio: np.ndarray, regions: list, sr: int = SAMPLE_RATE, gap: float = 0.3) -> tuple:
+    # A short pause is kept between regions so whisper still sees a boundary there.
+    gap_samples = np.zeros(int(gap * sr), dtype=np.float32)
+
+    pieces = []
+    timeline = []
+    position = 0
+    for index, (start, end) in enumerate(regions):
+        if index:
+            pieces.append(gap_samples)
+            position += len(gap_samples)
+        pieces.append(audio[start:end])
+        timeline.append((position / sr, start / sr, (end - start) / sr))
+        position += end - start
+
+    condensed = np.concatenate(pieces).astype(np.float32, copy=False) if pieces else np.zeros(0, np.float32)
+    return condensed, timeline
+
+
+def map_time(seconds: float, timeline: list, starts: list = None) -> float:
+    if not timeline:
+        return seconds
+
+    starts = starts or [entry[0] for entry in timeline]
+    index = max(bisect_right(starts, seconds) - 1, 0)
+    condensed_start, original_start, duration = timeline[index]
+    return round(original_start + min(max(seconds - condensed_start, 0.0), duration), 3)
+
+
+def remap_segments(segments: list, timeline: list) -> list:
+    starts = [entry[0] for entry in timeline]
+
+    remapped = []
+    for segment in segments:
+        segment = dict(segment, start=map_time(segment["start"], timeline, starts),
+                       end=map_time(segment["end"], timeline, starts))
+        if segment.get("words"):
+            segment["words"] = [dict(word, start=map_time(word["start"], timeline, starts),
+                                     end=map_time(word["end"], timeline, starts)) for word in segment["words"]]
+        remapped.append(segment)
+    return remapped
+
+
+def speech_stats(regions: list, total_samples: int, sr: int = SAMPLE_RATE) -> dict:
+    total = total_samples / sr
+    speech = sum(end - start for start, end in regions) / sr
+    return {
+        "regions": len(regions),
+        "total": round(total, 3),
+        "speech": round(speech, 3),
+        "skipped": round(total - speech, 3),
+        "skipped_ratio": round((total - speech) / total, 4) if total else 0.0,
+    }
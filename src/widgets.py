@@ -1,4 +1,3 @@
-import difflib
 import os
 import sys
 import time
@@ -9,10 +8,30 @@ import customtkinter as ctk
 from PIL import Image, ImageTk
 from customtkinter import filedialog as fd
 
-from src.functions import DROPDOWN, FONTS, ICONS, save_config, change_theme, load_config
+from src.cache import FEATURE_CACHE, PCM_CACHE, RESULT_CACHE
+from src.functions import DROPDOWN, FONTS, filter_values, save_config, load_config
 from src.py_win_style import set_opacity
 
 CURRENT_PATH = os.path.dirname(os.path.realpath(__file__))
+ICON_SIZES = {
+    "settings": (25, 25),
+    "folder": (18, 18)
+}
+
+
+class IconRegistry(dict):
+    # Icons are opened on first use, not at import, so they stay off the startup path.
+    def __missing__(self, name: str) -> ctk.CTkImage:
+        image = Image.open(os.path.join(CURRENT_PATH, "icons", f"{name}.png"))
+        self[name] = ctk.CTkImage(light_image=image, dark_image=image, size=ICON_SIZES.get(name, (20, 20)))
+        return self[name]
+
+
+ICONS = IconRegistry()
+
+
+def change_theme(new_theme):
+    ctk.set_appearance_mode(new_theme)
 
 
 class CTkScrollableDropdownFrame(ctk.CTkToplevel):
@@ -264,11 +283,9 @@ class CTkScrollableDropdownFrame(ctk.CTkToplevel):
             string = string.lower()
             self._deiconify()
             i = 1
+            matches = set(filter_values([widget.cget("text") for widget in self.widgets.values()], string))
             for key in self.widgets.keys():
-                s = self.widgets[key].cget("text").lower()
-                text_similarity = difflib.SequenceMatcher(None, s[0:len(string)], string).ratio()
-                similar = s.startswith(string) or text_similarity > 0.75
-                if not similar:
+                if self.widgets[key].cget("text") not in matches:
                     self.widgets[key].pack_forget()
                 else:
                     self.widgets[key].pack(fill="x", pady=2, padx=(self.padding, 0))
@@ -803,7 +820,8 @@ class CTkMessagebox(customtkinter.CTkToplevel):
 
 
 class CTkLoader(ctk.CTkFrame):
-    def __init__(self, master: any, opacity: float = 0.8, width: int = 40, height: int = 40):
+    def __init__(self, master: any, opacity: float = 0.8, width: int = 40, height: int = 40,
+                 cancel_command: any = None):
         self.master = master
         self.opacity = opacity
         self.width = width
@@ -821,6 +839,13 @@ class CTkLoader(ctk.CTkFrame):
         self.loader.grid(row=0, column=0, sticky="nsew")
         self.loader.start()
 
+        if cancel_command:
+            self.grid_rowconfigure(1, weight=1)
+            self.loader.grid(sticky="s")
+            self.cancel_btn = ctk.CTkButton(self, text="Cancel", width=100, height=28, corner_radius=3,
+                                            command=cancel_command)
+            self.cancel_btn.grid(row=1, column=0, pady=20, sticky="n")
+
         self.place(relwidth=1.0, relheight=1.0)
 
     def stop_loader(self):
@@ -892,7 +917,7 @@ class SettingsInterface(ctk.CTkFrame):
         super().__init__(master, border_width=2, **kwargs)
 
         self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(4, weight=1)
+        self.grid_rowconfigure(6, weight=1)
 
         self.config_file = f"{CURRENT_PATH}\\config.json"
         self.config = load_config(self.config_file)
@@ -920,8 +945,17 @@ class SettingsInterface(ctk.CTkFrame):
                                    command=self.select_dir_callback)
         folder_btn.grid(row=3, column=1, padx=40, pady=0, sticky="w")
 
+        cache_label = ctk.CTkLabel(self, text="Cache")
+        cache_label.grid(row=4, column=0, padx=40, pady=(20, 0), sticky="w")
+
+        self.cache_info_label = ctk.CTkLabel(self, text="", font=("", 11))
+        self.cache_info_label.grid(row=5, column=0, padx=40, pady=0, sticky="w")
+        clear_cache_btn = ctk.CTkButton(self, text="Clear", width=80, height=26, command=self.clear_cache_callback)
+        clear_cache_btn.grid(row=5, column=1, padx=40, pady=0, sticky="w")
+        self.update_cache_info()
+
         close_btn = ctk.CTkButton(self, text="Close", command=lambda: self.destroy(), width=100)
-        close_btn.grid(row=4, column=1, padx=20, pady=20, sticky="se")
+        close_btn.grid(row=6, column=1, padx=20, pady=20, sticky="se")
 
     def select_dir_callback(self):
         new_dir = fd.askdirectory()
@@ -929,6 +963,18 @@ class SettingsInterface(ctk.CTkFrame):
             save_config({"download_path": new_dir}, self.config_file)
             self.path_label.configure(text=new_dir)
 
+    def update_cache_info(self) -> None:
+        results = RESULT_CACHE.stats()
+        audio = PCM_CACHE.stats()
+        self.cache_info_label.configure(text=f"{results['entries']} results, {results['bytes'] / 1024 ** 2:.1f} MB; "
+                                             f"{audio['entries']} decoded audio, {audio['bytes'] / 1024 ** 2:.1f} MB")
+
+    def clear_cache_callback(self) -> None:
+        RESULT_CACHE.clear()
+        PCM_CACHE.clear()
+        FEATURE_CACHE.clear()
+        self.update_cache_info()
+
     def theme_callback(self, theme) -> None:
         self.theme_option.set(theme)
         save_config({"theme": str(theme).lower()}, self.config_file)
@@ -0,0 +1,19 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--perf", action="store_true", help="also run the wall-clock checks against perf_baseline.json")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: wall-clock check against the stored baseline, needs --perf")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--perf"):
+        return
+
+    skip = pytest.mark.skip(reason="wall-clock check, run with --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
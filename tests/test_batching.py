@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+whisper = pytest.importorskip("whisper")
+
+from src import audio as audio_module  # noqa: E402
+from src import batching  # noqa: E402
+from src.cache import FeatureCache, PcmCache  # noqa: E402
+from src.model_cache import MODEL_CACHE  # noqa: E402
+from src.perf import missing_requirements  # noqa: E402
+
+TINY_DIMS = {"n_mels": 80, "n_vocab": 51865, "n_audio_ctx": 1500, "n_audio_state": 384, "n_audio_head": 6,
+             "n_audio_layer": 4, "n_text_ctx": 448, "n_text_state": 384, "n_text_head": 6, "n_text_layer": 4}
+
+
+def load_tiny() -> any:
+    # The real checkpoint when it has been downloaded, otherwise the same
+    # architecture with seeded random weights: the text is noise, but every
+    # step of the decode path runs for real.
+    checkpoint = os.path.join(os.path.expanduser("~"), ".cache", "whisper", "tiny.pt")
+    if os.path.isfile(checkpoint):
+        return whisper.load_model("tiny", device="cpu")
+
+    torch.manual_seed(0)
+    model = whisper.model.Whisper(whisper.model.ModelDimensions(**TINY_DIMS))
+    return model.eval()
+
+
+@pytest.fixture
+def transcriber(tmp_path, monkeypatch):
+    if missing_requirements(["ffmpeg", "ffprobe"]):
+        pytest.skip("missing ffmpeg")
+
+    from src.benchmark import synthetic_clip, write_wav
+    from src.functions import WhisperTranscriber
+
+    monkeypatch.setattr(audio_module, "PCM_CACHE", PcmCache(tmp_path / "pcm", max_bytes=1024 ** 3))
+    monkeypatch.setattr(batching, "FEATURE_CACHE", FeatureCache(tmp_path / "features", max_bytes=1024 ** 3,
+                                                                memory_bytes=2 * 1024 ** 2))
+    MODEL_CACHE.put(("tiny", "cpu", None), load_tiny())
+
+    path = write_wav(str(tmp_path / "clip.wav"), synthetic_clip(40.0, seed=3))
+    created = []
+
+    def make(**kwargs) -> any:
+        created.append(WhisperTranscriber(audio_file=path, model_size="tiny", device="cpu", language="fr",
+                                          prompt={"temperature": 0.0}, **kwargs))
+        return created[-1]
+
+    yield make
+    for item in created:
+        item.release_model()
+    MODEL_CACHE.unload("tiny", "cpu")
+
+
+def test_stream_decodes_every_window(transcriber):
+    first = transcriber()
+    streamed = [segments for segments in first.iter_segments()]
+
+    duration = len(first.audio) / audio_module.SAMPLE_RATE
+    assert len(streamed) == len(batching.batch_windows(first.audio)) >= 2
+    segments = first.result["segments"]
+    assert all(0.0 <= segment["start"] <= segment["end"] <= duration + 0.01 for segment in segments)
+    assert all(a["start"] <= b["start"] for a, b in zip(segments, segments[1:]))
+
+
+def test_rerun_with_another_task_skips_the_encoder(transcriber, monkeypatch):
+    list(transcriber().iter_segments())
+
+    model = MODEL_CACHE.get("tiny", "cpu")
+    calls = []
+    encode = model.embed_audio
+    monkeypatch.setattr(model, "embed_audio", lambda mel: calls.append(len(mel)) or encode(mel))
+
+    list(transcriber(task="translate").iter_segments())
+    assert calls == [] and batching.FEATURE_CACHE.memory_stats()["hits"] > 0
@@ -0,0 +1,24 @@
+import numpy as np
+
+from src.cache import PcmCache, ResultCache
+
+
+def test_pcm_entry_over_budget_is_returned_uncached(tmp_path):
+    cache = PcmCache(tmp_path, max_bytes=1000)
+    audio = cache.put("k", np.ones(1000, np.float32))
+    assert audio is not None and len(audio) == 1000
+    assert cache.get("k") is None
+
+
+def test_pcm_entry_within_budget_is_mapped(tmp_path):
+    cache = PcmCache(tmp_path, max_bytes=10000)
+    audio = cache.put("k", np.arange(100, dtype=np.float32))
+    assert isinstance(audio, np.memmap) and audio[99] == 99
+
+
+def test_eviction_keeps_total_under_budget(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=2000)
+    for index in range(50):
+        cache.put(str(index), {"text": "x" * 100})
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.get("49") is not None
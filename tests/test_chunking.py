@@ -0,0 +1,44 @@
+import numpy as np
+
+from src.audio import SAMPLE_RATE
+from src.chunking import merge_chunk_results, split_on_silence
+
+BOUNDS = [(0, 10 * SAMPLE_RATE), (10 * SAMPLE_RATE, 20 * SAMPLE_RATE)]
+
+
+def chunk(start: float, end: float, text: str) -> dict:
+    return {"segments": [{"start": start, "end": end, "text": text}]}
+
+
+def test_repeated_words_are_kept_at_silence_cuts():
+    merged = merge_chunk_results([chunk(7.0, 10.0, " He said no no no"), chunk(0.0, 3.0, " no no no, I won't go.")],
+                                 BOUNDS)
+    assert merged["text"] == " He said no no no no no no, I won't go."
+
+
+def test_repeated_words_are_kept_without_timestamp_overlap():
+    merged = merge_chunk_results([chunk(7.0, 10.0, " we went to the big old market"),
+                                  chunk(0.0, 3.0, " the big old market and bought fish.")],
+                                 BOUNDS, hard_cuts=[10 * SAMPLE_RATE])
+    assert merged["chunking"]["boundary_overlaps"] == 0
+
+
+def test_overlap_is_trimmed_at_hard_cuts():
+    merged = merge_chunk_results([chunk(7.0, 10.5, " we went to the big old market"),
+                                  chunk(-0.5, 3.0, " the big old market, and bought fish.")],
+                                 BOUNDS, hard_cuts=[10 * SAMPLE_RATE])
+    assert merged["text"] == " we went to the big old market and bought fish."
+    assert merged["chunking"]["overlap_words_removed"] == 4
+
+
+def test_split_records_hard_cuts():
+    rng = np.random.default_rng(0)
+    audio = (0.1 * rng.standard_normal(70 * SAMPLE_RATE)).astype(np.float32)
+    hard_cuts = []
+    bounds = split_on_silence(audio, SAMPLE_RATE, 25.0, 30.0, hard_cuts=hard_cuts)
+    assert hard_cuts == [start for start, _ in bounds[1:]]
+
+    audio[28 * SAMPLE_RATE:29 * SAMPLE_RATE] = 0.0
+    hard_cuts = []
+    bounds = split_on_silence(audio, SAMPLE_RATE, 25.0, 30.0, hard_cuts=hard_cuts)
+    assert bounds[1][0] not in hard_cuts
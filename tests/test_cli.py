@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+pytest.importorskip("whisper")
+
+from src import functions
+from src.cli import iter_results
+from src.jobs import CANCELLED, JOB_SCHEDULER
+
+
+def fake_clips(options_list: list, batch_size: int = 16, cancel_token: any = None):
+    for index, options in enumerate(options_list):
+        time.sleep(0.1)
+        if cancel_token:
+            cancel_token.check()
+        yield index, {"text": options["audio"]}, None
+
+
+def test_pack_runs_as_one_scheduler_job(monkeypatch):
+    monkeypatch.setattr(functions, "transcribe_clips", fake_clips)
+    options_list = [{"audio": f"missing-{index}.wav", "model": "tiny", "device": "cpu"} for index in range(3)]
+
+    results = list(iter_results(options_list, pack=True))
+
+    assert [(index, result["text"]) for index, result, error in results] == \
+        [(index, options["audio"]) for index, options in enumerate(options_list)]
+    assert JOB_SCHEDULER.jobs()[-1].name == "pack" and JOB_SCHEDULER.jobs()[-1].trace.spans
+
+
+def test_cancelled_pack_reports_every_file(monkeypatch):
+    monkeypatch.setattr(functions, "transcribe_clips", fake_clips)
+    options_list = [{"audio": f"missing-{index}.wav", "model": "tiny", "device": "cpu"} for index in range(20)]
+
+    results = iter_results(options_list, pack=True)
+    first = next(results)
+    JOB_SCHEDULER.cancel_all()
+    rest = list(results)
+
+    assert first[2] is None and JOB_SCHEDULER.jobs()[-1].state == CANCELLED
+    assert len(rest) == 19 and sorted(index for index, result, error in [first] + rest) == list(range(20))
@@ -0,0 +1,33 @@
+import time
+
+from src.jobs import CANCELLED, DONE, JobScheduler
+
+
+def test_cancel_during_admission_runs_nothing():
+    scheduler = JobScheduler()
+    ran, errors = [], []
+
+    def estimate(options: dict) -> dict:
+        time.sleep(0.5)
+        return {"key": "test", "raw": 1, "bytes": 1}
+
+    job = scheduler.submit(lambda options, callback: ran.append(True), error_callback=errors.append, memory=estimate)
+    time.sleep(0.2)
+    assert job.cancel()
+    time.sleep(0.6)
+    scheduler.shutdown()
+
+    assert job.state == CANCELLED and ran == [] and len(errors) == 1
+
+
+def test_jobs_run_in_priority_order():
+    scheduler = JobScheduler()
+    order = []
+    blocker = scheduler.submit(lambda options, callback: time.sleep(0.2))
+    jobs = [scheduler.submit(lambda options, callback, name=name: order.append(name), priority=priority)
+            for name, priority in [("low", -1), ("high", 5), ("normal", 0)]]
+    for job in [blocker] + jobs:
+        job.wait(5)
+    scheduler.shutdown()
+
+    assert order == ["high", "normal", "low"] and all(job.state == DONE for job in jobs)
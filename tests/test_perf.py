@@ -0,0 +1,71 @@
+import pytest
+
+from src.model_cache import ModelCache
+from src.perf import STAGES, StubModel, calibrate, compare, load_baseline, missing_requirements, run_stages
+
+BASELINE = {"stages": {"vad": {"seconds": 0.1, "peak_kb": 1000.0}}}
+
+
+def test_compare_flags_slowdown():
+    regressions = compare({"vad": {"seconds": 0.2, "peak_kb": 1000.0}}, BASELINE)
+    assert len(regressions) == 1 and regressions[0].startswith("vad:")
+
+
+def test_compare_flags_memory_growth():
+    regressions = compare({"vad": {"seconds": 0.1, "peak_kb": 1200.0}}, BASELINE)
+    assert len(regressions) == 1 and "peak" in regressions[0]
+
+
+def test_compare_ignores_timer_noise():
+    baseline = {"stages": {"vad": {"seconds": 0.001, "peak_kb": 1000.0}}}
+    assert compare({"vad": {"seconds": 0.003, "peak_kb": 1000.0}}, baseline) == []
+
+
+def test_compare_fails_without_baseline():
+    regressions = compare({"split": {"seconds": 0.1, "peak_kb": 10.0}}, BASELINE)
+    assert regressions and "no baseline" in regressions[0]
+
+
+def test_compare_scales_by_calibration():
+    baseline = dict(BASELINE, calibration=0.01)
+    assert compare({"vad": {"seconds": 0.2, "peak_kb": 1000.0}}, baseline, calibration=0.02) == []
+    assert compare({"vad": {"seconds": 0.2, "peak_kb": 1000.0}}, baseline, calibration=0.01) != []
+
+
+def test_compare_skips_stages_that_did_not_run():
+    assert compare({"ingest": {"skipped": "missing ffmpeg"}}, BASELINE) == []
+
+
+def test_stub_model_can_be_evicted():
+    cache = ModelCache(idle_timeout=0)
+    cache.put(("base", "cpu", None), StubModel())
+    cache.sweep_idle()
+    assert cache.stats()["loaded"] == [] and cache.stats()["evictions"] == 1
+
+
+def test_every_stage_has_a_baseline():
+    baseline = load_baseline()
+    assert baseline.get("calibration")
+    assert sorted(baseline["stages"]) == sorted(STAGES)
+
+
+@pytest.mark.parametrize("name", list(STAGES))
+def test_stage_runs(name):
+    missing = missing_requirements(STAGES[name][1])
+    if missing:
+        pytest.skip(f"missing {', '.join(missing)}")
+
+    result = run_stages([name], repeat=1)[name]
+    assert result["seconds"] > 0 and result["peak_kb"] > 0
+
+
+# Wall-clock checks depend on the machine and its load, run them with --perf.
+@pytest.mark.perf
+@pytest.mark.parametrize("name", list(STAGES))
+def test_stage_within_baseline(name):
+    missing = missing_requirements(STAGES[name][1])
+    if missing:
+        pytest.skip(f"missing {', '.join(missing)}")
+
+    results = run_stages([name], repeat=5)
+    assert compare(results, load_baseline(), calibration=calibrate()) == []